@@ -0,0 +1,57 @@
+import argparse
+import os
+from typing import Dict, List
+
+import osmnx as ox
+from networkx import MultiDiGraph
+
+from shortest_path.modules.utils import clean_max_speed, load_multidigraph
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+README_CITIES: Dict[str, str] = {
+    "Edinburgh": "Edinburgh, United Kingdom",
+    "Lima": "Lima, Peru",
+    "Milan": "Milan, Italy",
+    "Munich": "Munich, Germany",
+    "Paris": "Paris, France",
+}
+
+
+def fixture_path(city: str) -> str:
+    return os.path.join(FIXTURES_DIR, f"{city}.graphml")
+
+
+def save_fixture(city: str) -> str:
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    G: MultiDiGraph = load_multidigraph(README_CITIES[city])
+    clean_max_speed(G)
+    path = fixture_path(city)
+    ox.save_graphml(G, path)
+    return path
+
+
+def load_fixture(city: str) -> MultiDiGraph:
+    path = fixture_path(city)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Missing fixture {path}, run `python -m benchmarks.fixtures {city}` first"
+        )
+    return ox.load_graphml(path, edge_dtypes={"maxspeed": int})
+
+
+def available_fixtures() -> List[str]:
+    return [city for city in README_CITIES if os.path.exists(fixture_path(city))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="BenchmarkFixtures",
+        description="Download the README cities once and save them as graph fixtures",
+    )
+    parser.add_argument(
+        "cities", nargs="*", default=list(README_CITIES), choices=list(README_CITIES)
+    )
+    args = parser.parse_args()
+    for city in args.cities:
+        print(f"Saved {save_fixture(city)}")
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import tracemalloc
+from typing import Dict
+
+from shortest_path.modules.compact_graph import (
+    CompactGraph,
+    convert_multidigraph_to_compact_graph,
+)
+from shortest_path.modules.utils import clean_max_speed
+
+from .fixtures import README_CITIES, available_fixtures, load_fixture
+
+BENCHMARKS_DIR = os.path.dirname(__file__)
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, "results", "graph_memory.json")
+
+ARRAYS = ["node_ids", "x_fixed", "y_fixed", "indptr", "indices", "length", "maxspeed"]
+CACHES = ["weight", "edge_sources", "id_map", "adjacency", "reverse_adjacency"]
+
+
+def traced_size(graph: CompactGraph, name: str) -> int:
+    # Allocations made while the cached property is built, which stay resident as
+    # long as the graph does.
+    tracemalloc.start()
+    getattr(graph, name)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def measure_graph(graph: CompactGraph) -> Dict[str, int]:
+    result = {"arrays": sum(getattr(graph, name).nbytes for name in ARRAYS)}
+    graph = CompactGraph(**{name: getattr(graph, name) for name in ARRAYS})
+    for name in CACHES:
+        result[name] = traced_size(graph, name)
+    result["total"] = sum(result.values())
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="GraphMemory",
+        description="Resident size of the compact graph arrays and its cached lists",
+    )
+    parser.add_argument("--cities", nargs="*", choices=list(README_CITIES))
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    cities = args.cities or available_fixtures()
+    if not cities:
+        raise SystemExit("No graph fixtures found, run `python -m benchmarks.fixtures`")
+
+    results: Dict[str, Dict[str, int]] = dict()
+    for city in cities:
+        G = load_fixture(city)
+        clean_max_speed(G)
+        graph = convert_multidigraph_to_compact_graph(G)
+        results[city] = measure_graph(graph)
+        print(
+            f"{city} ({graph.node_count} nodes, {graph.edge_count} edges): "
+            + ", ".join(
+                f"{name} {size / 1e6:.1f} MB" for name, size in results[city].items()
+            )
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+BENCHMARKS_DIR = os.path.dirname(__file__)
+REPOSITORY_DIR = os.path.dirname(os.path.abspath(BENCHMARKS_DIR))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "import_baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, "results", "import_time.json")
+
+HEAVY_MODULES = ["osmnx", "networkx", "matplotlib", "sklearn", "requests", "haversine"]
+
+# The routing core must never pull in the heavy modules at import time.
+CORE_MODULES = [
+    "shortest_path.compact_search",
+    "shortest_path.modules.compact_graph",
+    "shortest_path.modules.spatial_index",
+    "shortest_path.batch",
+    "shortest_path.map_matching",
+]
+MODULES = CORE_MODULES + [
+    "shortest_path.dijkstra",
+    "shortest_path.a_star",
+    "shortest_path.a_star_enhanced",
+    "shortest_path.raw_dijkstra",
+    "shortest_path.route_usage",
+]
+
+TIME_TOLERANCE = 0.3
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [
+    name for name in {heavy!r} if name in sys.modules
+]}}))
+"""
+
+
+def measure_cold_import(module: str, repeat: int) -> Dict:
+    # Every sample runs in a fresh interpreter so nothing is cached in sys.modules.
+    samples: List[float] = []
+    heavy: List[str] = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPOSITORY_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        probe = json.loads(output.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        heavy = probe["heavy"]
+    return {"median_seconds": statistics.median(samples), "heavy_modules": heavy}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="ImportTime",
+        description="Track the cold-start import latency of the routing modules",
+    )
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = {
+        module: measure_cold_import(module, args.repeat) for module in args.modules
+    }
+    for module, result in results.items():
+        heavy = ", ".join(result["heavy_modules"]) or "-"
+        print(f"{module}: {result['median_seconds'] * 1000:.1f} ms (heavy: {heavy})")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+
+    regressions: List[str] = [
+        f"{module}: imports {', '.join(results[module]['heavy_modules'])}"
+        for module in CORE_MODULES
+        if module in results and results[module]["heavy_modules"]
+    ]
+    if args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        for module, result in results.items():
+            if module not in baseline:
+                continue
+            previous = baseline[module]["median_seconds"]
+            current = result["median_seconds"]
+            if current > previous * (1 + args.time_tolerance):
+                regressions.append(
+                    f"{module}: {previous * 1000:.1f} ms -> {current * 1000:.1f} ms"
+                )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        raise SystemExit(1)
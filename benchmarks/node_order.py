@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from shortest_path.compact_search import a_star_compact, dijkstra_compact
+from shortest_path.modules.compact_graph import (
+    CompactGraph,
+    convert_multidigraph_to_compact_graph,
+    permute_nodes,
+)
+from shortest_path.modules.node_order import map_to_node_orders
+from shortest_path.modules.utils import clean_max_speed
+
+from .fixtures import README_CITIES, available_fixtures, load_fixture
+
+BENCHMARKS_DIR = os.path.dirname(__file__)
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, "results", "node_order.json")
+
+ORDERS = ["original"] + list(map_to_node_orders)
+SEARCHES = {"dijkstra_compact": dijkstra_compact, "a_star_compact": a_star_compact}
+
+
+def ordered_graph(graph: CompactGraph, order_name: str) -> CompactGraph:
+    if order_name == "original":
+        return graph
+    return permute_nodes(graph, map_to_node_orders[order_name](graph))
+
+
+def mean_edge_span(graph: CompactGraph) -> float:
+    # How far apart in memory the two ends of an edge are, a proxy for locality.
+    spans = np.abs(graph.edge_sources - graph.indices.astype(np.int64))
+    return float(spans.mean())
+
+
+def measure_order(
+    graph: CompactGraph, queries: List[Tuple[int, int]], repeat: int
+) -> Dict[str, float]:
+    result: Dict[str, float] = {"mean_edge_span": mean_edge_span(graph)}
+    dense_queries = [
+        (graph.id_map.dense(source), graph.id_map.dense(destination))
+        for source, destination in queries
+    ]
+    for search_name, search in SEARCHES.items():
+        wall_times: List[float] = []
+        for source, destination in dense_queries:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                search(graph, source, destination)
+                best = min(best, time.perf_counter() - start)
+            wall_times.append(best)
+        result[f"{search_name}_median_wall_time"] = statistics.median(wall_times)
+        result[f"{search_name}_total_wall_time"] = sum(wall_times)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="NodeOrderBenchmark",
+        description="Compare compact searches across node orderings of the fixtures",
+    )
+    parser.add_argument("--cities", nargs="*", choices=list(README_CITIES))
+    parser.add_argument("--orders", nargs="*", choices=ORDERS, default=ORDERS)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    cities = args.cities or available_fixtures()
+    if not cities:
+        raise SystemExit("No graph fixtures found, run `python -m benchmarks.fixtures`")
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = dict()
+    for city in cities:
+        G = load_fixture(city)
+        clean_max_speed(G)
+        graph = convert_multidigraph_to_compact_graph(G)
+        rng = random.Random(args.seed)
+        node_ids = graph.node_ids.tolist()
+        queries = [tuple(rng.sample(node_ids, 2)) for _ in range(args.queries)]
+        results[city] = dict()
+        for order_name in args.orders:
+            result = measure_order(
+                ordered_graph(graph, order_name), queries, args.repeat
+            )
+            results[city][order_name] = result
+            print(
+                f"{city} {order_name:>8}: edge span {result['mean_edge_span']:10.1f}, "
+                + ", ".join(
+                    f"{search_name} {result[f'{search_name}_total_wall_time']:.3f} s"
+                    for search_name in SEARCHES
+                )
+            )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to {args.output}")
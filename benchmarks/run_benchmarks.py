@@ -0,0 +1,600 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import networkx as nx
+from networkx import MultiDiGraph
+
+from shortest_path.dijkstra import dijkstra
+from shortest_path.raw_dijkstra import dijkstra_raw
+from shortest_path.a_star import a_star
+from shortest_path.a_star_enhanced import a_star_enhanced
+from shortest_path.alternatives import alternative_routes
+from shortest_path.compact_search import a_star_compact, dijkstra_compact
+from shortest_path.modules.compact_graph import (
+    CompactGraph,
+    convert_multidigraph_to_compact_graph,
+)
+from shortest_path.modules.counters import SearchCounters
+from shortest_path.modules.simple_graph import Graph
+from shortest_path.modules.tiled_graph import TiledGraph, write_tiled_graph
+from shortest_path.modules.edge_attributes import edge_attributes
+from shortest_path.modules.turn_costs import TurnCostModel
+from shortest_path.pareto_search import DEFAULT_WEIGHTINGS, weighted_routes
+from shortest_path.tiled_search import a_star_tiled
+from shortest_path.turn_search import a_star_turns, dijkstra_turns
+from shortest_path.modules.utils import (
+    clean_max_speed,
+    convert_multidigraph_to_graph,
+    create_simple_graph,
+    find_distance_by_nodes,
+)
+
+from .fixtures import (
+    FIXTURES_DIR,
+    README_CITIES,
+    available_fixtures,
+    fixture_path,
+    load_fixture,
+)
+
+BENCHMARKS_DIR = os.path.dirname(__file__)
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, "results", "latest.json")
+
+DISTANCE_BUCKETS: List[Tuple[str, float, float]] = [
+    ("0-2km", 0.0, 2.0),
+    ("2-5km", 2.0, 5.0),
+    ("5-10km", 5.0, 10.0),
+    ("10km+", 10.0, float("inf")),
+]
+
+TIME_TOLERANCE = 0.2
+MEMORY_TOLERANCE = 0.2
+COUNTER_TOLERANCE = 0.05
+COST_TOLERANCE = 1e-9
+
+TILE_SIZE = 0.01
+MAX_RESIDENT_TILES = 16
+
+
+@dataclass
+class BenchmarkContext:
+    graph: MultiDiGraph
+    raw_graph: Graph
+    compact_graph: CompactGraph
+    tiled_graph: TiledGraph
+    turn_costs: TurnCostModel
+    weighted_graphs: Dict[str, CompactGraph]
+    max_speed_allowed: float
+
+
+@dataclass
+class Query:
+    source: int
+    destination: int
+    bucket: str
+    optimum: float
+
+
+@dataclass
+class QueryResult:
+    city: str
+    engine: str
+    bucket: str
+    source: int
+    destination: int
+    wall_time: float
+    settled_nodes: int
+    heap_pushes: int
+    peak_memory: Optional[int]
+    cost: Optional[float]
+    optimum: float
+    cost_error: Optional[float]
+
+
+Engine = Callable[[BenchmarkContext, int, int, SearchCounters], Optional[float]]
+
+
+def run_dijkstra_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    simple_graph = create_simple_graph(context.graph, source, destination)
+    iterations = dijkstra(
+        graph=context.graph,
+        simple_graph=simple_graph,
+        source=source,
+        destination=destination,
+        video=False,
+        counters=counters,
+    )
+    return None if iterations is None else simple_graph[destination].distance
+
+
+def run_dijkstra_raw_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    result = dijkstra_raw(context.raw_graph, source, destination, counters=counters)
+    if result is None:
+        return None
+    _, weight_from_source, _ = result
+    return weight_from_source.get(destination, 0.0)
+
+
+def run_a_star_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    simple_graph = create_simple_graph(context.graph, source, destination)
+    iterations = a_star(
+        graph=context.graph,
+        simple_graph=simple_graph,
+        source=source,
+        destination=destination,
+        video=False,
+        max_speed_allowed=context.max_speed_allowed,
+        counters=counters,
+    )
+    return None if iterations is None else simple_graph[destination].distance
+
+
+def run_a_star_enhanced_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    simple_graph = create_simple_graph(context.graph, source, destination)
+    iterations = a_star_enhanced(
+        graph=context.graph,
+        simple_graph=simple_graph,
+        source=source,
+        destination=destination,
+        video=False,
+        max_speed_allowed=context.max_speed_allowed,
+        counters=counters,
+    )
+    return None if iterations is None else simple_graph[destination].distance
+
+
+def run_dijkstra_compact_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    graph = context.compact_graph
+    result = dijkstra_compact(
+        graph,
+        graph.id_map.dense(source),
+        graph.id_map.dense(destination),
+        counters=counters,
+    )
+    if result is None:
+        return None
+    _, weight_from_source, _ = result
+    return weight_from_source[graph.id_map.dense(destination)]
+
+
+def run_a_star_compact_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    graph = context.compact_graph
+    result = a_star_compact(
+        graph,
+        graph.id_map.dense(source),
+        graph.id_map.dense(destination),
+        counters=counters,
+    )
+    if result is None:
+        return None
+    _, weight_from_source, _ = result
+    return weight_from_source[graph.id_map.dense(destination)]
+
+
+def run_a_star_tiled_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    # Tiles are dropped first so every query pays for its own tile faults.
+    context.tiled_graph.resident_tiles.clear()
+    tiled_destination = context.tiled_graph.id_map.dense(destination)
+    result = a_star_tiled(
+        context.tiled_graph,
+        context.tiled_graph.id_map.dense(source),
+        tiled_destination,
+        counters=counters,
+    )
+    if result is None:
+        return None
+    _, weight_from_source, _ = result
+    return weight_from_source[tiled_destination]
+
+
+def turn_route_weight(
+    result: Optional[Tuple[int, List[float], List[int], int]],
+) -> Optional[float]:
+    if result is None:
+        return None
+    _, weight_from_source, _, last_edge = result
+    return 0.0 if last_edge == -1 else weight_from_source[last_edge]
+
+
+def run_dijkstra_turns_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    # The cost error against the node-based optimum is the ETA added by turn costs.
+    graph = context.compact_graph
+    result = dijkstra_turns(
+        graph,
+        graph.id_map.dense(source),
+        graph.id_map.dense(destination),
+        context.turn_costs,
+        counters=counters,
+    )
+    return turn_route_weight(result)
+
+
+def run_a_star_turns_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    graph = context.compact_graph
+    result = a_star_turns(
+        graph,
+        graph.id_map.dense(source),
+        graph.id_map.dense(destination),
+        context.turn_costs,
+        counters=counters,
+    )
+    return turn_route_weight(result)
+
+
+def run_alternatives_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    graph = context.compact_graph
+    routes = alternative_routes(
+        graph,
+        graph.id_map.dense(source),
+        graph.id_map.dense(destination),
+        counters=counters,
+    )
+    if not routes:
+        return None
+    _, _, time_sec = routes[0]
+    return time_sec / 60 / 60
+
+
+def run_weighted_routes_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    graph = context.compact_graph
+    routes = weighted_routes(
+        graph,
+        graph.id_map.dense(source),
+        graph.id_map.dense(destination),
+        counters=counters,
+    )
+    if not routes:
+        return None
+    return routes["fastest"][0]
+
+
+def run_dijkstra_weightings_engine(
+    context: BenchmarkContext, source: int, destination: int, counters: SearchCounters
+) -> Optional[float]:
+    # The baseline weighted_routes replaces: one dijkstra_compact per weighting.
+    graph = context.compact_graph
+    source, destination = graph.id_map.dense(source), graph.id_map.dense(destination)
+    weights = [
+        dijkstra_compact(weighted_graph, source, destination, counters=counters)
+        for weighted_graph in context.weighted_graphs.values()
+    ]
+    if weights[0] is None:
+        return None
+    _, weight_from_source, _ = weights[0]
+    return weight_from_source[destination]
+
+
+ENGINES: Dict[str, Engine] = {
+    "dijkstra": run_dijkstra_engine,
+    "dijkstra_raw": run_dijkstra_raw_engine,
+    "a_star": run_a_star_engine,
+    "a_star_enhanced": run_a_star_enhanced_engine,
+    "dijkstra_compact": run_dijkstra_compact_engine,
+    "a_star_compact": run_a_star_compact_engine,
+    "a_star_tiled": run_a_star_tiled_engine,
+    "dijkstra_turns": run_dijkstra_turns_engine,
+    "a_star_turns": run_a_star_turns_engine,
+    "alternatives": run_alternatives_engine,
+    "weighted_routes": run_weighted_routes_engine,
+    "dijkstra_weightings": run_dijkstra_weightings_engine,
+}
+
+
+def edge_travel_time(u: int, v: int, edges: Dict) -> float:
+    # The searches always follow key 0 of a multi-edge, so the reference does too.
+    return (edges[0]["length"] / 1000) / edges[0]["maxspeed"]
+
+
+def reference_cost(
+    graph: MultiDiGraph, source: int, destination: int
+) -> Optional[float]:
+    try:
+        return nx.dijkstra_path_length(
+            graph, source, destination, weight=edge_travel_time
+        )
+    except nx.NetworkXNoPath:
+        return None
+
+
+def distance_bucket(distance: float) -> str:
+    for label, lower, upper in DISTANCE_BUCKETS:
+        if lower <= distance < upper:
+            return label
+    return DISTANCE_BUCKETS[-1][0]
+
+
+def generate_queries(
+    context: BenchmarkContext, per_bucket: int, seed: int, max_attempts: int = 50
+) -> List[Query]:
+    rng = random.Random(seed)
+    nodes = sorted(context.graph.nodes)
+    queries_by_bucket: Dict[str, List[Query]] = {
+        label: [] for label, _, _ in DISTANCE_BUCKETS
+    }
+    attempts = per_bucket * len(DISTANCE_BUCKETS) * max_attempts
+    while attempts > 0 and any(
+        len(queries) < per_bucket for queries in queries_by_bucket.values()
+    ):
+        attempts -= 1
+        source, destination = rng.sample(nodes, 2)
+        bucket = distance_bucket(
+            find_distance_by_nodes(context.graph, source, destination)
+        )
+        if len(queries_by_bucket[bucket]) >= per_bucket:
+            continue
+        optimum = reference_cost(context.graph, source, destination)
+        if optimum is None:
+            continue
+        queries_by_bucket[bucket].append(Query(source, destination, bucket, optimum))
+    return [query for queries in queries_by_bucket.values() for query in queries]
+
+
+def measure_query(
+    city: str,
+    engine_name: str,
+    engine: Engine,
+    context: BenchmarkContext,
+    query: Query,
+    repeat: int,
+    track_memory: bool,
+) -> QueryResult:
+    wall_time = float("inf")
+    for _ in range(repeat):
+        counters = SearchCounters()
+        start = time.perf_counter()
+        cost = engine(context, query.source, query.destination, counters)
+        wall_time = min(wall_time, time.perf_counter() - start)
+
+    peak_memory: Optional[int] = None
+    if track_memory:
+        tracemalloc.start()
+        engine(context, query.source, query.destination, SearchCounters())
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    cost_error = None
+    if cost is not None and query.optimum > 0:
+        cost_error = (cost - query.optimum) / query.optimum
+    elif cost is not None:
+        cost_error = cost - query.optimum
+
+    return QueryResult(
+        city=city,
+        engine=engine_name,
+        bucket=query.bucket,
+        source=query.source,
+        destination=query.destination,
+        wall_time=wall_time,
+        settled_nodes=counters.settled_nodes,
+        heap_pushes=counters.heap_pushes,
+        peak_memory=peak_memory,
+        cost=cost,
+        optimum=query.optimum,
+        cost_error=cost_error,
+    )
+
+
+def summarize(results: List[QueryResult]) -> Dict[str, Dict[str, float]]:
+    grouped: Dict[str, List[QueryResult]] = dict()
+    for result in results:
+        key = f"{result.city}/{result.engine}/{result.bucket}"
+        grouped.setdefault(key, []).append(result)
+
+    summary: Dict[str, Dict[str, float]] = dict()
+    for key, group in grouped.items():
+        errors = [r.cost_error for r in group if r.cost_error is not None]
+        memory = [r.peak_memory for r in group if r.peak_memory is not None]
+        summary[key] = {
+            "queries": len(group),
+            "failures": sum(1 for r in group if r.cost is None),
+            "median_wall_time": statistics.median(r.wall_time for r in group),
+            "mean_settled_nodes": statistics.mean(r.settled_nodes for r in group),
+            "mean_heap_pushes": statistics.mean(r.heap_pushes for r in group),
+            "max_peak_memory": max(memory) if memory else None,
+            "max_cost_error": max(errors) if errors else None,
+        }
+    return summary
+
+
+def exceeds(current: Optional[float], baseline: Optional[float], tolerance: float):
+    if current is None or baseline is None:
+        return False
+    return current > baseline * (1 + tolerance)
+
+
+def find_regressions(
+    summary: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    time_tolerance: float = TIME_TOLERANCE,
+) -> List[str]:
+    regressions: List[str] = []
+    for key, current in summary.items():
+        if key not in baseline:
+            continue
+        previous = baseline[key]
+        checks = [
+            ("median_wall_time", time_tolerance),
+            ("mean_settled_nodes", COUNTER_TOLERANCE),
+            ("mean_heap_pushes", COUNTER_TOLERANCE),
+            ("max_peak_memory", MEMORY_TOLERANCE),
+        ]
+        for metric, tolerance in checks:
+            if exceeds(current.get(metric), previous.get(metric), tolerance):
+                regressions.append(
+                    f"{key}: {metric} {previous[metric]:.6g} -> {current[metric]:.6g}"
+                )
+        current_error = current.get("max_cost_error")
+        previous_error = previous.get("max_cost_error")
+        if (
+            current_error is not None
+            and previous_error is not None
+            and current_error > previous_error + COST_TOLERANCE
+        ):
+            regressions.append(
+                f"{key}: max_cost_error {previous_error:.6g} -> {current_error:.6g}"
+            )
+        previous_failures = previous.get("failures", 0)
+        if current["failures"] > previous_failures:
+            regressions.append(
+                f"{key}: failures {previous_failures} -> {current['failures']}"
+            )
+    return regressions
+
+
+def load_tiled_graph(city: str, compact_graph: CompactGraph) -> TiledGraph:
+    # The tiled file is only rewritten when it is missing, older than the fixture
+    # or written with another format version or tile size.
+    tiled_path = os.path.join(FIXTURES_DIR, f"{city}.tiles")
+    if os.path.exists(tiled_path) and os.path.getmtime(tiled_path) >= os.path.getmtime(
+        fixture_path(city)
+    ):
+        try:
+            tiled_graph = TiledGraph(tiled_path, MAX_RESIDENT_TILES)
+        except ValueError:
+            pass
+        else:
+            if tiled_graph.tile_size == TILE_SIZE:
+                return tiled_graph
+    write_tiled_graph(compact_graph, tiled_path, TILE_SIZE)
+    return TiledGraph(tiled_path, MAX_RESIDENT_TILES)
+
+
+def weighted_graph(
+    graph: CompactGraph, time_weight: float, distance_weight: float
+) -> CompactGraph:
+    # The compact weight is km / maxspeed, so this speed makes it the weighted cost.
+    return replace(graph, maxspeed=1 / (time_weight / graph.maxspeed + distance_weight))
+
+
+def load_context(city: str) -> BenchmarkContext:
+    graph: MultiDiGraph = load_fixture(city)
+    max_speed_allowed = clean_max_speed(graph, return_max_speed=True)
+    compact_graph = convert_multidigraph_to_compact_graph(graph)
+    tiled_graph = load_tiled_graph(city, compact_graph)
+    return BenchmarkContext(
+        graph=graph,
+        raw_graph=convert_multidigraph_to_graph(graph),
+        compact_graph=compact_graph,
+        tiled_graph=tiled_graph,
+        turn_costs=TurnCostModel(compact_graph, edge_attributes(graph, compact_graph)),
+        weighted_graphs={
+            name: weighted_graph(compact_graph, *weighting)
+            for name, weighting in DEFAULT_WEIGHTINGS.items()
+        },
+        max_speed_allowed=max_speed_allowed,
+    )
+
+
+def run_benchmarks(
+    cities: List[str],
+    engines: List[str],
+    per_bucket: int,
+    seed: int,
+    repeat: int = 1,
+    track_memory: bool = True,
+) -> List[QueryResult]:
+    results: List[QueryResult] = []
+    for city in cities:
+        context = load_context(city)
+        queries = generate_queries(context, per_bucket, seed)
+        print(f"{city}: {len(queries)} queries")
+        for engine_name in engines:
+            engine = ENGINES[engine_name]
+            for query in queries:
+                results.append(
+                    measure_query(
+                        city, engine_name, engine, context, query, repeat, track_memory
+                    )
+                )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="MapBenchmarks",
+        description="Compare the shortest path strategies on saved graph fixtures",
+    )
+    parser.add_argument("--cities", nargs="*", choices=list(README_CITIES))
+    parser.add_argument(
+        "--engines", nargs="*", choices=list(ENGINES), default=list(ENGINES)
+    )
+    parser.add_argument("--queries-per-bucket", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    cities = args.cities or available_fixtures()
+    if not cities:
+        raise SystemExit("No graph fixtures found, run `python -m benchmarks.fixtures`")
+
+    results = run_benchmarks(
+        cities=cities,
+        engines=args.engines,
+        per_bucket=args.queries_per_bucket,
+        seed=args.seed,
+        repeat=args.repeat,
+        track_memory=not args.no_memory,
+    )
+    summary = summarize(results)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(
+            {
+                "seed": args.seed,
+                "summary": summary,
+                "queries": [asdict(result) for result in results],
+            },
+            output_file,
+            indent=2,
+        )
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(summary, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = find_regressions(summary, baseline, args.time_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline")
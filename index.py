@@ -1,18 +1,25 @@
 import argparse
+from importlib import import_module
 
-from shortest_path.dijkstra import run_dijkstra
-from shortest_path.raw_dijkstra import run_raw_dijkstra
-from shortest_path.a_star import run_a_star
-from shortest_path.a_star_enhanced import run_a_star_enhanced
+from shortest_path import COMPACT_STRATEGIES
 
+# Strategies are imported only once selected, so the CLI starts without osmnx.
 map_to_strategies = {
-    "shortest_path_dijkstra": run_dijkstra,
-    "shortest_path_a_star": run_a_star,
-    "shortest_path_a_star_enhanced": run_a_star_enhanced,
-    # "shortest_path_dijkstra_raw": run_raw_dijkstra,
+    "shortest_path_dijkstra": ("shortest_path.dijkstra", "run_dijkstra"),
+    "shortest_path_a_star": ("shortest_path.a_star", "run_a_star"),
+    "shortest_path_a_star_enhanced": (
+        "shortest_path.a_star_enhanced",
+        "run_a_star_enhanced",
+    ),
+    # "shortest_path_dijkstra_raw": ("shortest_path.raw_dijkstra", "run_raw_dijkstra"),
 }
 
 
+def load_strategy(utility: str):
+    module_name, function_name = map_to_strategies[utility]
+    return getattr(import_module(module_name), function_name)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog="MapUtils",
@@ -50,8 +57,110 @@ if __name__ == "__main__":
         help="output an animation of the path",
         default=argparse.SUPPRESS,
     )
+    parser.add_argument(
+        "--metrics",
+        nargs="?",
+        type=str,
+        const="-",
+        help="emit per-query search metrics to a file, or stdout when omitted",
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        "--metrics-format",
+        type=str,
+        choices=["json", "prometheus"],
+        help="metrics output format",
+        default="json",
+    )
+    parser.add_argument(
+        "--raster",
+        action="store_true",
+        help="render frames with the NumPy rasterizer instead of matplotlib",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    batch_parser = subparsers.add_parser(
+        "batch", help="route OD pairs streamed from a CSV or JSONL file"
+    )
+    batch_parser.add_argument(
+        "input", type=str, help="CSV or JSONL file with OD pairs, - for stdin"
+    )
+    batch_parser.add_argument(
+        "-o", "--output", type=str, default="-", help="JSONL or Parquet output"
+    )
+    batch_parser.add_argument("-l", "--location", type=str, help="place to download")
+    batch_parser.add_argument("--graphml", type=str, help="saved GraphML graph")
+    batch_parser.add_argument("--graph", type=str, help="saved compact graph (.npz)")
+    batch_parser.add_argument(
+        "--strategy",
+        type=str,
+        choices=COMPACT_STRATEGIES,
+        default="a_star",
+    )
+    batch_parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    batch_parser.add_argument("--output-format", choices=["jsonl", "parquet"])
+    batch_parser.add_argument("--chunk-size", type=int, default=1000)
+    batch_parser.add_argument(
+        "--with-path", action="store_true", help="include the node path"
+    )
+    batch_parser.add_argument(
+        "--max-snap-m",
+        type=float,
+        help="reject pairs whose points are farther than this from any node",
+    )
+    match_parser = subparsers.add_parser(
+        "match", help="snap GPS traces streamed from a CSV or JSONL file"
+    )
+    match_parser.add_argument(
+        "input", type=str, help="CSV or JSONL points with id, lat and lon, - for stdin"
+    )
+    match_parser.add_argument(
+        "-o", "--output", type=str, default="-", help="JSONL output"
+    )
+    match_parser.add_argument("-l", "--location", type=str, help="place to download")
+    match_parser.add_argument("--graphml", type=str, help="saved GraphML graph")
+    match_parser.add_argument("--graph", type=str, help="saved compact graph (.npz)")
+    match_parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    match_parser.add_argument("--workers", type=int)
+    match_parser.add_argument("--chunk-size", type=int, default=16)
     args = parser.parse_args()
 
+    if args.command == "batch":
+        from shortest_path.batch import run_batch
+
+        if args.location is None and args.graphml is None and args.graph is None:
+            batch_parser.error("one of --location, --graphml or --graph is required")
+        run_batch(
+            input_path=args.input,
+            output_path=args.output,
+            location=args.location,
+            graphml=args.graphml,
+            graph_path=args.graph,
+            strategy_name=args.strategy,
+            input_format=args.input_format,
+            output_format=args.output_format,
+            chunk_size=args.chunk_size,
+            with_path=args.with_path,
+            max_snap_m=args.max_snap_m,
+        )
+        raise SystemExit(0)
+
+    if args.command == "match":
+        from shortest_path.map_matching import run_map_matching
+
+        if args.location is None and args.graphml is None and args.graph is None:
+            match_parser.error("one of --location, --graphml or --graph is required")
+        run_map_matching(
+            input_path=args.input,
+            output_path=args.output,
+            location=args.location,
+            graphml=args.graphml,
+            graph_path=args.graph,
+            input_format=args.input_format,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+        )
+        raise SystemExit(0)
+
     if "utility" not in args:
         args.utility = [None]
 
@@ -65,7 +174,17 @@ if __name__ == "__main__":
         args.destination = None
     if "video" not in args:
         args.video = None
+    if "metrics" not in args:
+        args.metrics = None
 
-    strategy = map_to_strategies[args.utility[0]]
+    strategy = load_strategy(args.utility[0])
 
-    strategy(args.location, args.source, args.destination, args.video)
+    strategy(
+        args.location,
+        args.source,
+        args.destination,
+        args.video,
+        metrics=args.metrics,
+        metrics_format=args.metrics_format,
+        raster=args.raster,
+    )
@@ -0,0 +1,2 @@
+# Kept free of imports so command line parsers can list them without NumPy.
+COMPACT_STRATEGIES = ("dijkstra", "a_star")
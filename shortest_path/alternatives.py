@@ -0,0 +1,371 @@
+import argparse
+import heapq
+from typing import Dict, List, Optional, Set, Tuple
+
+from .compact_search import heuristic_to_destination
+from .modules.compact_graph import CompactGraph
+from .modules.counters import SearchCounters, start_timer, stop_timer
+
+MAX_STRETCH = 0.25
+MAX_SHARING = 0.8
+LOCAL_OPTIMALITY = 0.25
+MAX_CANDIDATES = 64
+
+Route = Tuple[List[int], float, float]
+
+
+def bidirectional_trees(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    max_stretch: float = MAX_STRETCH,
+    local_optimality: float = LOCAL_OPTIMALITY,
+    counters: Optional[SearchCounters] = None,
+) -> Tuple[float, List[float], List[int], List[float], List[int], List[int]]:
+    # One forward search from the source and one backward search from the
+    # destination, alternating on the smaller key. Instead of stopping when the
+    # frontiers meet, each side keeps going past the optimum so that via nodes of
+    # admissible alternatives are settled from both sides. A via path within the
+    # stretch limit whose plateau spans the local optimality window has a node
+    # that both sides reach within the stretch limit minus that window, so the
+    # radius of each side stops there, and never below the optimum itself. Nodes
+    # whose straight-line bound to the far end breaks the stretch limit cannot
+    # lie on such a path and are pruned.
+    indptr, indices, weights = graph.adjacency
+    reverse_indptr, reverse_edges, edge_sources = graph.reverse_adjacency
+    forward_weight: List[float] = [float("inf")] * graph.node_count
+    backward_weight: List[float] = [float("inf")] * graph.node_count
+    forward_edge: List[int] = [-1] * graph.node_count
+    backward_edge: List[int] = [-1] * graph.node_count
+    forward_settled: List[bool] = [False] * graph.node_count
+    backward_settled: List[bool] = [False] * graph.node_count
+    settled_both: List[int] = []
+
+    heuristic_start = start_timer(counters)
+    forward_bound = heuristic_to_destination(graph, destination)
+    backward_bound = heuristic_to_destination(graph, source)
+    stop_timer(counters, "heuristic_time", heuristic_start)
+
+    search_start = start_timer(counters)
+    best_weight = float("inf")
+    forward_weight[source] = 0.0
+    backward_weight[destination] = 0.0
+    forward_queue = [(0.0, source)]
+    backward_queue = [(0.0, destination)]
+    if counters is not None:
+        counters.heap_pushes += 2
+        counters.max_heap_size = max(counters.max_heap_size, 1)
+    radius_factor = max(1.0, 1 + max_stretch - local_optimality)
+    while True:
+        limit = best_weight * (1 + max_stretch)
+        radius = best_weight * radius_factor
+        forward_open = bool(forward_queue) and forward_queue[0][0] <= radius
+        backward_open = bool(backward_queue) and backward_queue[0][0] <= radius
+        if not forward_open and not backward_open:
+            break
+        is_forward = forward_open and (
+            not backward_open or forward_queue[0][0] <= backward_queue[0][0]
+        )
+        if is_forward:
+            queue, weight, other_weight = forward_queue, forward_weight, backward_weight
+            settled, other_settled = forward_settled, backward_settled
+            bound, other_queue = forward_bound, backward_queue
+        else:
+            queue, weight, other_weight = (
+                backward_queue,
+                backward_weight,
+                forward_weight,
+            )
+            settled, other_settled = backward_settled, forward_settled
+            bound, other_queue = backward_bound, forward_queue
+
+        current_weight, current_node = heapq.heappop(queue)
+        if counters is not None:
+            counters.heap_pops += 1
+        # A node the other side has not settled is further from the far end than
+        # the key of the other queue, and so is every via path through it.
+        other_key = other_queue[0][0] if other_queue else float("inf")
+        if (
+            settled[current_node]
+            or current_weight + bound[current_node] > limit
+            or (not other_settled[current_node] and current_weight + other_key > limit)
+        ):
+            if counters is not None:
+                counters.stale_pops += 1
+            continue
+        settled[current_node] = True
+        if counters is not None:
+            counters.settled_nodes += 1
+        if other_settled[current_node]:
+            settled_both.append(current_node)
+
+        if is_forward:
+            edges = range(indptr[current_node], indptr[current_node + 1])
+        else:
+            edges = reverse_edges[
+                reverse_indptr[current_node] : reverse_indptr[current_node + 1]
+            ]
+        for edge in edges:
+            if counters is not None:
+                counters.relaxations += 1
+            next_node = indices[edge] if is_forward else edge_sources[edge]
+            new_weight = current_weight + weights[edge]
+            if (
+                weight[next_node] > new_weight
+                and new_weight + bound[next_node] <= limit
+            ):
+                weight[next_node] = new_weight
+                if is_forward:
+                    forward_edge[next_node] = edge
+                else:
+                    backward_edge[next_node] = edge
+                heapq.heappush(queue, (new_weight, next_node))
+                if new_weight + other_weight[next_node] < best_weight:
+                    best_weight = new_weight + other_weight[next_node]
+                    limit = best_weight * (1 + max_stretch)
+                if counters is not None:
+                    counters.improving_relaxations += 1
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size,
+                        len(forward_queue) + len(backward_queue),
+                    )
+    stop_timer(counters, "search_time", search_start)
+    return (
+        best_weight,
+        forward_weight,
+        forward_edge,
+        backward_weight,
+        backward_edge,
+        settled_both,
+    )
+
+
+def via_path(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    via: int,
+    forward_edge: List[int],
+    backward_edge: List[int],
+) -> List[int]:
+    _, indices, _ = graph.adjacency
+    _, _, edge_sources = graph.reverse_adjacency
+    edges_in_path: List[int] = []
+    current_node = via
+    while current_node != source:
+        edge = forward_edge[current_node]
+        edges_in_path.append(edge)
+        current_node = edge_sources[edge]
+    edges_in_path.reverse()
+    current_node = via
+    while current_node != destination:
+        edge = backward_edge[current_node]
+        edges_in_path.append(edge)
+        current_node = indices[edge]
+    return edges_in_path
+
+
+def bounded_weight(
+    graph: CompactGraph, source: int, destination: int, max_weight: float
+) -> float:
+    # Point-to-point search that gives up past max_weight. State lives in dicts
+    # sized by the explored ball, since many of these run per query.
+    indptr, indices, weights = graph.adjacency
+    weight_from_source: Dict[int, float] = {source: 0.0}
+    settled: Set[int] = set()
+    priority_queue = [(0.0, source)]
+    while priority_queue:
+        current_weight, current_node = heapq.heappop(priority_queue)
+        if current_node == destination:
+            return current_weight
+        if current_node in settled:
+            continue
+        settled.add(current_node)
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            next_node = indices[edge]
+            new_weight = current_weight + weights[edge]
+            if new_weight < max_weight and new_weight < weight_from_source.get(
+                next_node, float("inf")
+            ):
+                weight_from_source[next_node] = new_weight
+                heapq.heappush(priority_queue, (new_weight, next_node))
+    return float("inf")
+
+
+def is_locally_optimal(
+    graph: CompactGraph,
+    edges_in_path: List[int],
+    via_position: int,
+    window: float,
+    forward_edge: List[int],
+    backward_edge: List[int],
+) -> bool:
+    # T-test: the stretch of path within window/2 either side of the via node must
+    # itself be a shortest path, which rules out detours that only exist to touch
+    # the via node.
+    _, indices, weights = graph.adjacency
+    _, _, edge_sources = graph.reverse_adjacency
+    start = via_position
+    segment_weight = 0.0
+    while start > 0 and segment_weight < window / 2:
+        start -= 1
+        segment_weight += weights[edges_in_path[start]]
+    end = via_position
+    ahead_weight = 0.0
+    while end < len(edges_in_path) and ahead_weight < window / 2:
+        ahead_weight += weights[edges_in_path[end]]
+        end += 1
+    segment_weight += ahead_weight
+    if start == end:
+        return True
+
+    # When the part before the via node is also in the backward tree, or the part
+    # after it in the forward tree, the segment lies on a tree path and is
+    # shortest already. Otherwise only a strictly shorter path disproves it, so
+    # the search never needs to look past the weight of the segment itself.
+    if all(
+        backward_edge[edge_sources[edge]] == edge
+        for edge in edges_in_path[start:via_position]
+    ) or all(
+        forward_edge[indices[edge]] == edge for edge in edges_in_path[via_position:end]
+    ):
+        return True
+    segment_source = edge_sources[edges_in_path[start]]
+    segment_destination = indices[edges_in_path[end - 1]]
+    return bounded_weight(
+        graph, segment_source, segment_destination, segment_weight * (1 - 1e-9)
+    ) == float("inf")
+
+
+def to_route(graph: CompactGraph, edges_in_path: List[int]) -> Route:
+    dist = float(graph.length[edges_in_path].sum()) / 1000
+    time_sec = float(graph.weight[edges_in_path].sum()) * 60 * 60
+    return edges_in_path, dist, time_sec
+
+
+def alternative_routes(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    max_alternatives: int = 2,
+    max_stretch: float = MAX_STRETCH,
+    max_sharing: float = MAX_SHARING,
+    local_optimality: float = LOCAL_OPTIMALITY,
+    counters: Optional[SearchCounters] = None,
+) -> List[Route]:
+    if source == destination:
+        return [to_route(graph, [])]
+    (
+        best_weight,
+        forward_weight,
+        forward_edge,
+        backward_weight,
+        backward_edge,
+        settled_both,
+    ) = bidirectional_trees(
+        graph, source, destination, max_stretch, local_optimality, counters
+    )
+    if best_weight == float("inf"):
+        return []
+
+    reconstruction_start = start_timer(counters)
+    _, indices, weights = graph.adjacency
+    _, _, edge_sources = graph.reverse_adjacency
+
+    def starts_plateau(node: int) -> bool:
+        # Inside a plateau the forward and backward trees share the edge into the
+        # node, and every via node of that plateau yields the same path, so only
+        # the first node of each plateau settled from both sides is kept as a
+        # candidate.
+        edge = forward_edge[node]
+        return (
+            edge == -1
+            or backward_edge[edge_sources[edge]] != edge
+            or edge_sources[edge] not in via_weight
+        )
+
+    via_weight = {
+        node: forward_weight[node] + backward_weight[node] for node in settled_both
+    }
+    candidates = sorted(
+        (
+            node
+            for node in settled_both
+            if via_weight[node] <= best_weight * (1 + max_stretch)
+            and starts_plateau(node)
+        ),
+        key=via_weight.__getitem__,
+    )
+
+    shortest = via_path(
+        graph, source, destination, candidates[0], forward_edge, backward_edge
+    )
+    routes: List[Route] = [to_route(graph, shortest)]
+    selected_edges: Set[int] = set(shortest)
+    for via in candidates[1 : MAX_CANDIDATES + 1]:
+        if len(routes) > max_alternatives:
+            break
+        edges_in_path = via_path(
+            graph, source, destination, via, forward_edge, backward_edge
+        )
+        nodes = [source] + [indices[edge] for edge in edges_in_path]
+        if len(set(nodes)) != len(nodes):
+            continue
+        shared_weight = sum(
+            weights[edge] for edge in edges_in_path if edge in selected_edges
+        )
+        if shared_weight > max_sharing * best_weight:
+            continue
+        if not is_locally_optimal(
+            graph,
+            edges_in_path,
+            nodes.index(via),
+            local_optimality * best_weight,
+            forward_edge,
+            backward_edge,
+        ):
+            continue
+        routes.append(to_route(graph, edges_in_path))
+        selected_edges.update(edges_in_path)
+    stop_timer(counters, "reconstruction_time", reconstruction_start)
+    return routes
+
+
+if __name__ == "__main__":
+    from .batch import load_compact_graph_for_batch
+
+    parser = argparse.ArgumentParser(
+        prog="AlternativeRoutes",
+        description="Find the shortest route and up to a few alternatives at once",
+    )
+    parser.add_argument("source", type=int, help="OSM id of the source node")
+    parser.add_argument("destination", type=int, help="OSM id of the target")
+    parser.add_argument("-l", "--location", type=str)
+    parser.add_argument("--graphml", type=str)
+    parser.add_argument("--graph", type=str, help="saved compact graph (.npz)")
+    parser.add_argument("--alternatives", type=int, default=2)
+    parser.add_argument("--max-stretch", type=float, default=MAX_STRETCH)
+    parser.add_argument("--max-sharing", type=float, default=MAX_SHARING)
+    args = parser.parse_args()
+
+    graph = load_compact_graph_for_batch(args.location, args.graphml, args.graph)
+    counters = SearchCounters()
+    routes = alternative_routes(
+        graph,
+        graph.id_map.dense(args.source),
+        graph.id_map.dense(args.destination),
+        max_alternatives=args.alternatives,
+        max_stretch=args.max_stretch,
+        max_sharing=args.max_sharing,
+        counters=counters,
+    )
+    if not routes:
+        print("Failed to find a path")
+    for number, (edges_in_path, dist, time_sec) in enumerate(routes):
+        print(
+            f"Route {number}: {dist:.3f} km, "
+            f"{int(time_sec // 60)} m {int(time_sec % 60)} sec, "
+            f"{len(edges_in_path)} edges"
+        )
+    print(f"Settled {counters.settled_nodes} nodes")
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+import numpy as np
+
+from .compact_search import map_to_compact_strategies, reconstruct_path_compact
+from .modules.compact_graph import (
+    CompactGraph,
+    convert_multidigraph_to_compact_graph,
+    load_compact_graph,
+)
+from .modules.spatial_index import SpatialIndex
+from .modules.utils import clean_max_speed, load_multidigraph
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
+
+OD_FIELDS = ("source_lat", "source_lon", "destination_lat", "destination_lon")
+
+
+def read_od_pairs(input_file: TextIO, input_format: str) -> Iterator[Dict]:
+    if input_format == "csv":
+        yield from csv.DictReader(input_file)
+    elif input_format == "jsonl":
+        for line in input_file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown input format {input_format}")
+
+
+def chunked(rows: Iterable[Dict], chunk_size: int) -> Iterator[List[Dict]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_od_pair(row: Dict) -> Tuple[Optional[List[float]], Optional[str]]:
+    coordinates: List[float] = []
+    for field in OD_FIELDS:
+        value = row.get(field)
+        if value is None or value == "":
+            return None, f"missing {field}"
+        try:
+            coordinate = float(value)
+        except (TypeError, ValueError):
+            return None, f"invalid {field}: {value!r}"
+        if not np.isfinite(coordinate):
+            return None, f"invalid {field}: {value!r}"
+        coordinates.append(coordinate)
+    return coordinates, None
+
+
+def route_chunk(
+    graph: CompactGraph,
+    spatial_index: SpatialIndex,
+    chunk: List[Dict],
+    strategy: Callable,
+    with_path: bool = False,
+    max_snap_m: Optional[float] = None,
+) -> List[Dict]:
+    # A malformed row gets an error record instead of failing the whole batch.
+    parsed = [parse_od_pair(row) for row in chunk]
+    points = np.array(
+        [coordinates for coordinates, _ in parsed if coordinates is not None]
+    ).reshape(-1, len(OD_FIELDS))
+    snapped = iter(())
+    if len(points):
+        sources, source_snaps = spatial_index.nearest_nodes(points[:, 0], points[:, 1])
+        destinations, destination_snaps = spatial_index.nearest_nodes(
+            points[:, 2], points[:, 3]
+        )
+        snapped = zip(
+            sources.tolist(),
+            destinations.tolist(),
+            source_snaps.tolist(),
+            destination_snaps.tolist(),
+        )
+
+    records: List[Dict] = []
+    for row, (coordinates, error) in zip(chunk, parsed):
+        record = {
+            "id": row.get("id"),
+            "source": None,
+            "destination": None,
+            "source_snap_m": None,
+            "destination_snap_m": None,
+            "distance_km": None,
+            "time_sec": None,
+            "error": error,
+        }
+        if with_path:
+            record["path"] = None
+        records.append(record)
+        if coordinates is None:
+            continue
+        source, destination, source_snap, destination_snap = next(snapped)
+        record["source"] = int(graph.node_ids[source])
+        record["destination"] = int(graph.node_ids[destination])
+        record["source_snap_m"] = source_snap
+        record["destination_snap_m"] = destination_snap
+        if max_snap_m is not None and max(source_snap, destination_snap) > max_snap_m:
+            record["error"] = f"no node within {max_snap_m:g} m"
+            continue
+        result = strategy(graph, source, destination)
+        if result is not None:
+            _, _, previous_edge = result
+            edges_in_path, dist, time_sec = reconstruct_path_compact(
+                graph, source, destination, previous_edge
+            )
+            record["distance_km"] = dist
+            record["time_sec"] = time_sec
+            if with_path:
+                path = [source] + graph.indices[edges_in_path].tolist()
+                record["path"] = graph.node_ids[path].tolist()
+    return records
+
+
+class JsonlWriter:
+    def __init__(self, path: str):
+        self.output_file = sys.stdout if path == "-" else open(path, "w")
+
+    def write(self, records: List[Dict]) -> None:
+        self.output_file.writelines(json.dumps(record) + "\n" for record in records)
+        self.output_file.flush()
+
+    def close(self) -> None:
+        if self.output_file is not sys.stdout:
+            self.output_file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path: str, with_path: bool = False):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa = pa
+        fields = [
+            ("id", pa.string()),
+            ("source", pa.int64()),
+            ("destination", pa.int64()),
+            ("source_snap_m", pa.float64()),
+            ("destination_snap_m", pa.float64()),
+            ("distance_km", pa.float64()),
+            ("time_sec", pa.float64()),
+            ("error", pa.string()),
+        ]
+        if with_path:
+            fields.append(("path", pa.list_(pa.int64())))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, records: List[Dict]) -> None:
+        for record in records:
+            if record["id"] is not None:
+                record["id"] = str(record["id"])
+        self.writer.write_table(self.pa.Table.from_pylist(records, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def load_compact_graph_for_batch(
+    location=None, graphml=None, graph_path=None
+) -> CompactGraph:
+    if graph_path is not None:
+        return load_compact_graph(graph_path)
+    if graphml is not None:
+        import osmnx as ox
+
+        G: MultiDiGraph = ox.load_graphml(graphml)
+    else:
+        G = load_multidigraph(location)
+    clean_max_speed(G)
+    return convert_multidigraph_to_compact_graph(G)
+
+
+def infer_format(path: str, default: str) -> str:
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return {"csv": "csv", "jsonl": "jsonl", "parquet": "parquet"}.get(
+        extension, default
+    )
+
+
+def run_batch(
+    input_path: str,
+    output_path: str = "-",
+    location=None,
+    graphml=None,
+    graph_path=None,
+    strategy_name: str = "a_star",
+    input_format: Optional[str] = None,
+    output_format: Optional[str] = None,
+    chunk_size: int = 1000,
+    with_path: bool = False,
+    max_snap_m: Optional[float] = None,
+) -> None:
+    graph = load_compact_graph_for_batch(location, graphml, graph_path)
+    spatial_index = SpatialIndex(graph)
+    strategy = map_to_compact_strategies[strategy_name]
+    input_format = input_format or infer_format(input_path, "csv")
+    output_format = output_format or infer_format(output_path, "jsonl")
+
+    if output_format == "parquet":
+        writer = ParquetWriter(output_path, with_path)
+    else:
+        writer = JsonlWriter(output_path)
+
+    routed = 0
+    start = time.perf_counter()
+    input_file = sys.stdin if input_path == "-" else open(input_path, newline="")
+    try:
+        for chunk in chunked(read_od_pairs(input_file, input_format), chunk_size):
+            writer.write(
+                route_chunk(
+                    graph, spatial_index, chunk, strategy, with_path, max_snap_m
+                )
+            )
+            routed += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(
+                f"Routed {routed} pairs in {elapsed:.1f} s "
+                f"({routed / elapsed:.1f} pairs/s)",
+                file=sys.stderr,
+            )
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        writer.close()
@@ -0,0 +1,191 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+
+import numpy as np
+
+from . import COMPACT_STRATEGIES
+from .modules.compact_graph import CompactGraph
+from .modules.counters import SearchCounters, start_timer, stop_timer
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def dijkstra_compact(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    counters: Optional[SearchCounters] = None,
+) -> Optional[Tuple[int, List[float], List[int]]]:
+    indptr, indices, weights = graph.adjacency
+    weight_from_source: List[float] = [float("inf")] * graph.node_count
+    previous_edge: List[int] = [-1] * graph.node_count
+    visited_nodes: List[bool] = [False] * graph.node_count
+
+    search_start = start_timer(counters)
+    iteration = 0
+    weight_from_source[source] = 0.0
+    priority_queue = [(0.0, source)]
+    if counters is not None:
+        counters.heap_pushes += 1
+        counters.max_heap_size = max(counters.max_heap_size, 1)
+    while priority_queue:
+        current_weight, current_node = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
+        if current_node == destination:
+            stop_timer(counters, "search_time", search_start)
+            return iteration, weight_from_source, previous_edge
+        if visited_nodes[current_node]:
+            if counters is not None:
+                counters.stale_pops += 1
+            continue
+        visited_nodes[current_node] = True
+        if counters is not None:
+            counters.settled_nodes += 1
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            iteration += 1
+            if counters is not None:
+                counters.relaxations += 1
+            next_node = indices[edge]
+            new_weight = current_weight + weights[edge]
+            if weight_from_source[next_node] > new_weight:
+                weight_from_source[next_node] = new_weight
+                previous_edge[next_node] = edge
+                heapq.heappush(priority_queue, (new_weight, next_node))
+                if counters is not None:
+                    counters.improving_relaxations += 1
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size, len(priority_queue)
+                    )
+    stop_timer(counters, "search_time", search_start)
+    return None
+
+
+def heuristic_to_destination(graph: CompactGraph, destination: int) -> List[float]:
+    latitudes = np.radians(graph.y)
+    longitudes = np.radians(graph.x)
+    destination_latitude = latitudes[destination]
+    a = (
+        np.sin((latitudes - destination_latitude) / 2) ** 2
+        + np.cos(latitudes)
+        * np.cos(destination_latitude)
+        * np.sin((longitudes - longitudes[destination]) / 2) ** 2
+    )
+    distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return (distance_km / graph.maxspeed.max()).tolist()
+
+
+def a_star_compact(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    counters: Optional[SearchCounters] = None,
+) -> Optional[Tuple[int, List[float], List[int]]]:
+    indptr, indices, weights = graph.adjacency
+    weight_from_source: List[float] = [float("inf")] * graph.node_count
+    previous_edge: List[int] = [-1] * graph.node_count
+    visited_nodes: List[bool] = [False] * graph.node_count
+
+    heuristic_start = start_timer(counters)
+    heuristic = heuristic_to_destination(graph, destination)
+    stop_timer(counters, "heuristic_time", heuristic_start)
+
+    search_start = start_timer(counters)
+    iteration = 0
+    weight_from_source[source] = 0.0
+    priority_queue = [(heuristic[source], source)]
+    if counters is not None:
+        counters.heap_pushes += 1
+        counters.max_heap_size = max(counters.max_heap_size, 1)
+    while priority_queue:
+        _, current_node = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
+        if current_node == destination:
+            stop_timer(counters, "search_time", search_start)
+            return iteration, weight_from_source, previous_edge
+        if visited_nodes[current_node]:
+            if counters is not None:
+                counters.stale_pops += 1
+            continue
+        visited_nodes[current_node] = True
+        if counters is not None:
+            counters.settled_nodes += 1
+        current_weight = weight_from_source[current_node]
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            iteration += 1
+            if counters is not None:
+                counters.relaxations += 1
+            next_node = indices[edge]
+            new_weight = current_weight + weights[edge]
+            if weight_from_source[next_node] > new_weight:
+                weight_from_source[next_node] = new_weight
+                previous_edge[next_node] = edge
+                heapq.heappush(
+                    priority_queue, (new_weight + heuristic[next_node], next_node)
+                )
+                if counters is not None:
+                    counters.improving_relaxations += 1
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size, len(priority_queue)
+                    )
+    stop_timer(counters, "search_time", search_start)
+    return None
+
+
+map_to_compact_strategies: Dict[str, Callable] = {
+    "dijkstra": dijkstra_compact,
+    "a_star": a_star_compact,
+}
+assert tuple(map_to_compact_strategies) == COMPACT_STRATEGIES
+
+
+def shortest_path_tree(
+    graph: CompactGraph, source: int
+) -> Tuple[List[float], List[int], List[int]]:
+    indptr, indices, weights = graph.adjacency
+    weight_from_source: List[float] = [float("inf")] * graph.node_count
+    previous_edge: List[int] = [-1] * graph.node_count
+    visited_nodes: List[bool] = [False] * graph.node_count
+    settled_order: List[int] = []
+
+    weight_from_source[source] = 0.0
+    priority_queue = [(0.0, source)]
+    while priority_queue:
+        current_weight, current_node = heapq.heappop(priority_queue)
+        if visited_nodes[current_node]:
+            continue
+        visited_nodes[current_node] = True
+        settled_order.append(current_node)
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            next_node = indices[edge]
+            new_weight = current_weight + weights[edge]
+            if weight_from_source[next_node] > new_weight:
+                weight_from_source[next_node] = new_weight
+                previous_edge[next_node] = edge
+                heapq.heappush(priority_queue, (new_weight, next_node))
+    return weight_from_source, previous_edge, settled_order
+
+
+def reconstruct_path_compact(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    previous_edge: List[int],
+    counters: Optional[SearchCounters] = None,
+) -> Tuple[List[int], float, float]:
+    reconstruction_start = start_timer(counters)
+    edge_sources = graph.edge_sources
+    edges_in_path: List[int] = []
+    current_node = destination
+    while current_node != source:
+        edge = previous_edge[current_node]
+        edges_in_path.append(edge)
+        current_node = int(edge_sources[edge])
+    edges_in_path.reverse()
+    dist = float(graph.length[edges_in_path].sum()) / 1000
+    time_sec = float(graph.weight[edges_in_path].sum()) * 60 * 60
+    stop_timer(counters, "reconstruction_time", reconstruction_start)
+    return edges_in_path, dist, time_sec
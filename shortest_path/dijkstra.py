@@ -1,8 +1,7 @@
-import osmnx as ox
-from networkx import MultiDiGraph
-from typing import Dict, Optional
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Optional
 import random
-import requests
 import heapq
 
 from .modules.utils import (
@@ -16,6 +15,15 @@ from .modules.utils import (
     load_multidigraph,
 )
 from .modules.simple_graph import Node
+from .modules.counters import (
+    SearchCounters,
+    emit_metrics,
+    start_timer,
+    stop_timer,
+)
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
 
 
 def dijkstra(
@@ -25,23 +33,38 @@ def dijkstra(
     destination: int,
     video: bool,
     algorithm_name="dijkstra",
+    counters: Optional[SearchCounters] = None,
+    raster: bool = False,
 ) -> Optional[int]:
     for edge in graph.edges:
         style_unvisited_edge(graph, edge)
 
+    search_start = start_timer(counters)
     iteration = 0
     priority_queue = [(0, source)]
+    if counters is not None:
+        counters.heap_pushes += 1
+        counters.max_heap_size = max(counters.max_heap_size, 1)
     while priority_queue:
         _, node = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
         if node == destination:
+            stop_timer(counters, "search_time", search_start)
             return iteration
 
         if simple_graph[node].visited:
+            if counters is not None:
+                counters.stale_pops += 1
             continue
         simple_graph[node].visited = True
+        if counters is not None:
+            counters.settled_nodes += 1
 
         for edge in graph.out_edges(node):
             iteration += 1
+            if counters is not None:
+                counters.relaxations += 1
             current_node: int = edge[0]
             next_node: int = edge[1]
             visited_edge = (current_node, next_node, 0)
@@ -58,9 +81,16 @@ def dijkstra(
                     simple_graph[node].distance + edge_weight
                 )
                 simple_graph[next_node].previous = node
+                if counters is not None:
+                    counters.improving_relaxations += 1
                 heapq.heappush(
                     priority_queue, (simple_graph[next_node].distance, next_node)
                 )
+                if counters is not None:
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size, len(priority_queue)
+                    )
                 for active_edges in graph.out_edges(next_node):
                     style_active_edge(graph, (active_edges[0], active_edges[1], 0))
             if video:
@@ -72,14 +102,26 @@ def dijkstra(
                         iteration=iteration,
                         algorithm=f"{algorithm_name}_assets/{algorithm_name}-exploration_{frame_number}",
                         dpi=256,
+                        raster=raster,
                     )
+    stop_timer(counters, "search_time", search_start)
     return None
 
 
 def run_dijkstra(
-    location=None, source_point=None, destination_point=None, video=False
+    location=None,
+    source_point=None,
+    destination_point=None,
+    video=False,
+    metrics=None,
+    metrics_format="json",
+    raster=False,
 ) -> None:
+    import osmnx as ox
+
     if location is None or source_point is None:
+        import requests
+
         response = requests.get("https://ipinfo.io")
         response_json = response.json()
         location = f"{response_json['city']}, {response_json['country']}"
@@ -106,6 +148,7 @@ def run_dijkstra(
 
     simple_graph: Dict[int, Node] = create_simple_graph(G, source, destination)
 
+    counters = SearchCounters() if metrics is not None else None
     algorithm_name = "dijkstra"
     iterations = dijkstra(
         graph=G,
@@ -114,10 +157,16 @@ def run_dijkstra(
         destination=destination,
         video=video,
         algorithm_name=algorithm_name,
+        counters=counters,
+        raster=raster,
     )
     if iterations is not None:
         dist, time = reconstruct_path(
-            graph=G, simple_graph=simple_graph, source=source, destination=destination
+            graph=G,
+            simple_graph=simple_graph,
+            source=source,
+            destination=destination,
+            counters=counters,
         )
         plot_graph(
             graph=G,
@@ -127,6 +176,14 @@ def run_dijkstra(
             time=time,
             dist=dist,
             dpi=512,
+            raster=raster,
         )
     else:
         print("Failed to find a path")
+    if counters is not None:
+        emit_metrics(
+            counters,
+            metrics,
+            metrics_format,
+            labels={"algorithm": algorithm_name, "location": location},
+        )
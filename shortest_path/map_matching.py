@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import argparse
+import heapq
+import os
+import sys
+import time
+from collections import deque
+from itertools import groupby, islice
+from multiprocessing.pool import Pool
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .batch import JsonlWriter, infer_format, load_compact_graph_for_batch
+from .batch import read_od_pairs as read_rows
+from .modules.compact_graph import CompactGraph
+from .modules.spatial_index import EARTH_RADIUS_M, SpatialIndex
+
+SEARCH_RADIUS_M = 50.0
+MAX_CANDIDATES = 8
+GPS_SIGMA_M = 5.0
+TRANSITION_BETA_M = 10.0
+MAX_ROUTE_FACTOR = 3.0
+
+Trace = Tuple[Optional[str], np.ndarray, np.ndarray]
+# Shortest path trees of the transition searches into a step, by search source.
+SearchTrees = Dict[int, Dict[int, int]]
+Step = Tuple[int, np.ndarray, np.ndarray, np.ndarray, SearchTrees]
+
+_worker_graph: Optional[CompactGraph] = None
+_worker_index: Optional[SpatialIndex] = None
+
+
+def great_circle_m(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    latitudes = np.radians(latitudes)
+    longitudes = np.radians(longitudes)
+    a = (
+        np.sin(np.diff(latitudes) / 2) ** 2
+        + np.cos(latitudes[:-1])
+        * np.cos(latitudes[1:])
+        * np.sin(np.diff(longitudes) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bounded_one_to_many(
+    graph: CompactGraph, source: int, targets: Set[int], max_length: float
+) -> Tuple[Dict[int, float], Dict[int, int]]:
+    # Travel-time search that only follows paths up to max_length metres and stops
+    # once every target is settled. State lives in dicts sized by the explored
+    # area, since one trace runs thousands of these small searches.
+    indptr, indices, weights = graph.adjacency
+    lengths = graph.edge_lengths
+    weight_from_source: Dict[int, float] = {source: 0.0}
+    length_from_source: Dict[int, float] = {source: 0.0}
+    previous_edge: Dict[int, int] = dict()
+    settled: Set[int] = set()
+    remaining = set(targets)
+    priority_queue = [(0.0, source)]
+    while priority_queue and remaining:
+        current_weight, current_node = heapq.heappop(priority_queue)
+        if current_node in settled:
+            continue
+        settled.add(current_node)
+        remaining.discard(current_node)
+        current_length = length_from_source[current_node]
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            next_node = indices[edge]
+            new_length = current_length + lengths[edge]
+            if new_length > max_length:
+                continue
+            new_weight = current_weight + weights[edge]
+            if weight_from_source.get(next_node, float("inf")) > new_weight:
+                weight_from_source[next_node] = new_weight
+                length_from_source[next_node] = new_length
+                previous_edge[next_node] = edge
+                heapq.heappush(priority_queue, (new_weight, next_node))
+    reached = {node: length_from_source[node] for node in targets if node in settled}
+    return reached, previous_edge
+
+
+def transition_lengths(
+    graph: CompactGraph,
+    from_edges: np.ndarray,
+    from_fractions: np.ndarray,
+    to_edges: np.ndarray,
+    to_fractions: np.ndarray,
+    max_length: float,
+) -> Tuple[np.ndarray, SearchTrees]:
+    lengths = graph.edge_lengths
+    _, indices, _ = graph.adjacency
+    edge_sources = graph.edge_sources
+    to_sources = edge_sources[to_edges].tolist()
+    targets = set(to_sources)
+    route_lengths = np.full((len(from_edges), len(to_edges)), np.inf)
+    searches: Dict[int, Dict[int, float]] = dict()
+    trees: SearchTrees = dict()
+    for row, (from_edge, from_fraction) in enumerate(
+        zip(from_edges.tolist(), from_fractions.tolist())
+    ):
+        remaining = lengths[from_edge] * (1 - from_fraction)
+        head = indices[from_edge]
+        if head not in searches:
+            searches[head], trees[head] = bounded_one_to_many(
+                graph, head, targets, max_length
+            )
+        reached = searches[head]
+        for column, (to_edge, to_fraction) in enumerate(
+            zip(to_edges.tolist(), to_fractions.tolist())
+        ):
+            if to_edge == from_edge and to_fraction >= from_fraction:
+                route_lengths[row, column] = lengths[to_edge] * (
+                    to_fraction - from_fraction
+                )
+            elif to_sources[column] in reached:
+                route_lengths[row, column] = (
+                    remaining
+                    + reached[to_sources[column]]
+                    + lengths[to_edge] * to_fraction
+                )
+    return route_lengths, trees
+
+
+def connect_edges(
+    graph: CompactGraph,
+    from_edge: int,
+    from_fraction: float,
+    to_edge: int,
+    to_fraction: float,
+    trees: SearchTrees,
+) -> List[int]:
+    # Edges to append after from_edge to reach to_edge, read back from the tree of
+    # the transition search that scored the move. Moving forward along the same
+    # edge needs none, while moving backwards has to leave the edge and come
+    # around to its start again.
+    if from_edge == to_edge and to_fraction >= from_fraction:
+        return []
+    _, indices, _ = graph.adjacency
+    head = indices[from_edge]
+    tail = int(graph.edge_sources[to_edge])
+    previous_edge = trees[head]
+    edges_between: List[int] = [to_edge]
+    current_node = tail
+    while current_node != head:
+        edge = previous_edge[current_node]
+        edges_between.append(edge)
+        current_node = int(graph.edge_sources[edge])
+    edges_between.reverse()
+    return edges_between
+
+
+def match_trace(
+    graph: CompactGraph,
+    spatial_index: SpatialIndex,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    radius: float = SEARCH_RADIUS_M,
+    max_candidates: int = MAX_CANDIDATES,
+    sigma: float = GPS_SIGMA_M,
+    beta: float = TRANSITION_BETA_M,
+) -> Tuple[List[int], List[List[int]], int]:
+    points, edges, distances, fractions = spatial_index.candidate_edges(
+        latitudes, longitudes, radius, max_candidates
+    )
+    bounds = np.searchsorted(points, np.arange(len(latitudes) + 1))
+    step_lengths = great_circle_m(latitudes, longitudes)
+
+    # Viterbi runs point by point, keeping only the scores of the current
+    # candidates plus one back-pointer array per matched point. When no candidate
+    # can be reached from the previous ones the trace is broken and restarted.
+    matched_edges: List[int] = [-1] * len(latitudes)
+    segments: List[Tuple[List[Step], int]] = []
+    steps: List[Step] = []
+    scores = np.empty(0)
+    previous: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    travelled = 0.0
+    for point in range(len(latitudes)):
+        if point > 0:
+            travelled += step_lengths[point - 1]
+        start, end = bounds[point], bounds[point + 1]
+        if start == end:
+            continue
+        emission = -0.5 * (distances[start:end] / sigma) ** 2
+        if previous is not None:
+            previous_edges, previous_fractions = previous
+            route_lengths, trees = transition_lengths(
+                graph,
+                previous_edges,
+                previous_fractions,
+                edges[start:end],
+                fractions[start:end],
+                MAX_ROUTE_FACTOR * travelled + 2 * radius,
+            )
+            transition = scores[:, None] - np.abs(route_lengths - travelled) / beta
+            back_pointer = transition.argmax(axis=0)
+            best = transition[back_pointer, np.arange(end - start)]
+            if np.isfinite(best).any():
+                scores = best + emission
+                steps.append(
+                    (
+                        point,
+                        edges[start:end],
+                        fractions[start:end],
+                        back_pointer,
+                        trees,
+                    )
+                )
+            else:
+                segments.append((steps, int(scores.argmax())))
+                steps = []
+                previous = None
+        if previous is None:
+            scores = emission
+            steps.append(
+                (
+                    point,
+                    edges[start:end],
+                    fractions[start:end],
+                    np.full(end - start, -1),
+                    dict(),
+                )
+            )
+        previous = (edges[start:end], fractions[start:end])
+        travelled = 0.0
+    if steps:
+        segments.append((steps, int(scores.argmax())))
+
+    # Each segment between breaks gets its own path, since nothing connects them.
+    paths: List[List[int]] = []
+    for steps, state in segments:
+        chosen: List[Tuple[int, float, SearchTrees]] = []
+        for point, step_edges, step_fractions, back_pointer, trees in reversed(steps):
+            chosen.append((int(step_edges[state]), float(step_fractions[state]), trees))
+            matched_edges[point] = chosen[-1][0]
+            state = int(back_pointer[state])
+        chosen.reverse()
+        path_edges = [chosen[0][0]]
+        for (from_edge, from_fraction, _), (to_edge, to_fraction, trees) in zip(
+            chosen, chosen[1:]
+        ):
+            path_edges.extend(
+                connect_edges(
+                    graph, from_edge, from_fraction, to_edge, to_fraction, trees
+                )
+            )
+        paths.append(path_edges)
+    return matched_edges, paths, max(0, len(segments) - 1)
+
+
+def read_traces(rows: Iterator[Dict]) -> Iterator[Trace]:
+    # Points of a trace must be consecutive and in time order, so traces are
+    # streamed one at a time instead of loading the whole file.
+    for trace_id, points in groupby(rows, key=lambda row: row.get("id")):
+        coordinates = np.array(
+            [[float(point["lat"]), float(point["lon"])] for point in points]
+        )
+        yield trace_id, coordinates[:, 0], coordinates[:, 1]
+
+
+def _init_worker(graph: CompactGraph) -> None:
+    global _worker_graph, _worker_index
+    _worker_graph = graph
+    _worker_index = SpatialIndex(graph)
+    _worker_index.build_edge_tree()
+
+
+def _match_trace(trace: Trace) -> Dict:
+    graph = _worker_graph
+    trace_id, latitudes, longitudes = trace
+    matched_edges, paths, breaks = match_trace(
+        graph, _worker_index, latitudes, longitudes
+    )
+    node_paths: List[List[int]] = []
+    for path_edges in paths:
+        nodes = [int(graph.edge_sources[path_edges[0]])]
+        nodes += graph.indices[path_edges].tolist()
+        node_paths.append(graph.node_ids[nodes].tolist())
+    return {
+        "id": trace_id,
+        "points": len(latitudes),
+        "matched_points": sum(1 for edge in matched_edges if edge >= 0),
+        "breaks": breaks,
+        "matched_edges": [
+            (
+                graph.node_ids[[graph.edge_sources[edge], graph.indices[edge]]].tolist()
+                if edge >= 0
+                else None
+            )
+            for edge in matched_edges
+        ],
+        "paths": node_paths,
+    }
+
+
+def match_in_windows(
+    pool: Pool, traces: Iterator[Trace], window_size: int, chunk_size: int
+) -> Iterator[Dict]:
+    # Pool.imap drains its input as fast as it can, so traces are handed over in
+    # windows and at most two windows are in flight: the one being written out
+    # and the next one, which keeps the workers busy at window boundaries.
+    pending: "deque[Iterator[Dict]]" = deque()
+    while True:
+        window = list(islice(traces, window_size))
+        if window:
+            pending.append(pool.imap(_match_trace, window, chunksize=chunk_size))
+            if len(pending) < 2:
+                continue
+        if not pending:
+            return
+        yield from pending.popleft()
+
+
+def run_map_matching(
+    input_path: str,
+    output_path: str = "-",
+    location=None,
+    graphml=None,
+    graph_path=None,
+    input_format: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 16,
+) -> None:
+    graph = load_compact_graph_for_batch(location, graphml, graph_path)
+    input_format = input_format or infer_format(input_path, "csv")
+    writer = JsonlWriter(output_path)
+    workers = workers or os.cpu_count() or 1
+
+    traces = points = 0
+    start = time.perf_counter()
+    input_file = sys.stdin if input_path == "-" else open(input_path, newline="")
+    pool = None
+    try:
+        trace_stream = read_traces(read_rows(input_file, input_format))
+        if workers == 1:
+            _init_worker(graph)
+            records = map(_match_trace, trace_stream)
+        else:
+            pool = Pool(workers, initializer=_init_worker, initargs=(graph,))
+            records = match_in_windows(
+                pool, trace_stream, workers * chunk_size, chunk_size
+            )
+        for record in records:
+            writer.write([record])
+            traces += 1
+            points += record["points"]
+            if traces % 100 == 0:
+                elapsed = time.perf_counter() - start
+                print(
+                    f"Matched {traces} traces, {points} points in {elapsed:.1f} s "
+                    f"({points / elapsed:.1f} points/s)",
+                    file=sys.stderr,
+                )
+    finally:
+        # Every result has been consumed on success, so terminating only stops
+        # idle workers, and on an error it keeps them from outliving the run.
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if input_file is not sys.stdin:
+            input_file.close()
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(
+        f"Matched {traces} traces, {points} points in {elapsed:.1f} s "
+        f"({points / max(elapsed, 1e-9):.1f} points/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="MapMatching",
+        description="Snap GPS traces to road network paths with an HMM",
+    )
+    parser.add_argument(
+        "input", type=str, help="CSV or JSONL points with id, lat and lon, - for stdin"
+    )
+    parser.add_argument("-o", "--output", type=str, default="-")
+    parser.add_argument("-l", "--location", type=str)
+    parser.add_argument("--graphml", type=str)
+    parser.add_argument("--graph", type=str, help="saved compact graph (.npz)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    args = parser.parse_args()
+    if args.location is None and args.graphml is None and args.graph is None:
+        parser.error("one of --location, --graphml or --graph is required")
+
+    run_map_matching(
+        input_path=args.input,
+        output_path=args.output,
+        location=args.location,
+        graphml=args.graphml,
+        graph_path=args.graph,
+        input_format=args.input_format,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+
+from .node_ids import NodeIdMap, from_fixed, to_fixed
+from .utils import get_max_speed
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
+
+
+@dataclass
+class CompactGraph:
+    node_ids: np.ndarray
+    x_fixed: np.ndarray
+    y_fixed: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    length: np.ndarray
+    maxspeed: np.ndarray
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    @property
+    def x(self) -> np.ndarray:
+        return from_fixed(self.x_fixed)
+
+    @property
+    def y(self) -> np.ndarray:
+        return from_fixed(self.y_fixed)
+
+    @cached_property
+    def weight(self) -> np.ndarray:
+        return (self.length / 1000) / self.maxspeed
+
+    @cached_property
+    def edge_sources(self) -> np.ndarray:
+        return np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+
+    @cached_property
+    def id_map(self) -> NodeIdMap:
+        return NodeIdMap.from_node_ids(self.node_ids)
+
+    @cached_property
+    def adjacency(self) -> Tuple[List[int], List[int], List[float]]:
+        # Plain lists are much faster than NumPy scalars inside the heapq loops.
+        return self.indptr.tolist(), self.indices.tolist(), self.weight.tolist()
+
+    @cached_property
+    def edge_lengths(self) -> List[float]:
+        return self.length.tolist()
+
+    @cached_property
+    def reverse_adjacency(self) -> Tuple[List[int], List[int], List[int]]:
+        # In-edges of every node as ids into the forward arrays, plus edge sources.
+        reverse_indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.indices, minlength=self.node_count),
+            out=reverse_indptr[1:],
+        )
+        reverse_edges = np.argsort(self.indices, kind="stable")
+        return (
+            reverse_indptr.tolist(),
+            reverse_edges.tolist(),
+            self.edge_sources.tolist(),
+        )
+
+
+def convert_multidigraph_to_compact_graph(graph: MultiDiGraph) -> CompactGraph:
+    node_ids = np.fromiter(graph.nodes, dtype=np.int64, count=len(graph))
+    id_map = NodeIdMap.from_node_ids(node_ids)
+    x = np.array([graph.nodes[node]["x"] for node in graph.nodes], dtype=np.float64)
+    y = np.array([graph.nodes[node]["y"] for node in graph.nodes], dtype=np.float64)
+
+    edge_count = graph.number_of_edges()
+    length = np.empty(edge_count, dtype=np.float64)
+    maxspeed = np.empty(edge_count, dtype=np.float64)
+    ends = np.empty((edge_count, 2), dtype=np.int64)
+    for position, (u, v, edge_data) in enumerate(graph.edges(data=True)):
+        length[position] = edge_data["length"]
+        maxspeed[position] = get_max_speed(edge_data)
+        ends[position] = (u, v)
+    sources = id_map.to_dense(ends[:, 0]).astype(np.int64)
+    targets = id_map.to_dense(ends[:, 1])
+
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(node_ids)), out=indptr[1:])
+    compact_graph = CompactGraph(
+        node_ids=node_ids,
+        x_fixed=to_fixed(x),
+        y_fixed=to_fixed(y),
+        indptr=indptr,
+        indices=targets[order],
+        length=length[order],
+        maxspeed=maxspeed[order],
+    )
+    compact_graph.id_map = id_map
+    return compact_graph
+
+
+def permute_nodes(graph: CompactGraph, order: np.ndarray) -> CompactGraph:
+    # order[new] is the old dense id of each node. Every node keeps its out-edges
+    # in their original order, so only whole CSR rows move.
+    new_index = np.empty(graph.node_count, dtype=np.int64)
+    new_index[order] = np.arange(graph.node_count)
+    degrees = np.diff(graph.indptr)[order]
+    indptr = np.zeros(graph.node_count + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    edge_order = (
+        np.arange(graph.edge_count)
+        - np.repeat(indptr[:-1], degrees)
+        + np.repeat(graph.indptr[order], degrees)
+    )
+    return CompactGraph(
+        node_ids=graph.node_ids[order],
+        x_fixed=graph.x_fixed[order],
+        y_fixed=graph.y_fixed[order],
+        indptr=indptr,
+        indices=new_index[graph.indices[edge_order]].astype(np.uint32),
+        length=graph.length[edge_order],
+        maxspeed=graph.maxspeed[edge_order],
+    )
+
+
+def save_compact_graph(graph: CompactGraph, path: str) -> None:
+    np.savez(
+        path,
+        node_ids=graph.node_ids,
+        x_fixed=graph.x_fixed,
+        y_fixed=graph.y_fixed,
+        indptr=graph.indptr,
+        indices=graph.indices,
+        length=graph.length,
+        maxspeed=graph.maxspeed,
+    )
+
+
+def load_compact_graph(path: str) -> CompactGraph:
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    # Graphs saved before the fixed-point coordinates keep float64 degrees.
+    if "x" in arrays:
+        arrays["x_fixed"] = to_fixed(arrays.pop("x"))
+        arrays["y_fixed"] = to_fixed(arrays.pop("y"))
+    arrays["indices"] = arrays["indices"].astype(np.uint32, copy=False)
+    # Older files also carried the OSM edge keys, now kept in EdgeAttributes.
+    arrays.pop("edge_keys", None)
+    return CompactGraph(**arrays)
@@ -0,0 +1,73 @@
+import json
+import sys
+from dataclasses import asdict, dataclass, fields
+from time import perf_counter
+from typing import Dict, Optional
+
+METRIC_PREFIX = "shortest_path"
+
+TIMER_FIELDS = ("heuristic_time", "search_time", "reconstruction_time")
+
+
+@dataclass
+class SearchCounters:
+    settled_nodes: int = 0
+    relaxations: int = 0
+    improving_relaxations: int = 0
+    heap_pushes: int = 0
+    heap_pops: int = 0
+    stale_pops: int = 0
+    max_heap_size: int = 0
+    heuristic_time: float = 0.0
+    search_time: float = 0.0
+    reconstruction_time: float = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+    def to_json_line(self, labels: Optional[Dict[str, str]] = None) -> str:
+        return json.dumps({**(labels or {}), **self.to_dict()})
+
+    def to_prometheus(self, labels: Optional[Dict[str, str]] = None) -> str:
+        label_text = ",".join(
+            f'{name}="{value}"' for name, value in (labels or {}).items()
+        )
+        label_text = f"{{{label_text}}}" if label_text else ""
+        lines = []
+        for field in fields(self):
+            name = field.name
+            if name in TIMER_FIELDS:
+                name = name.replace("_time", "_seconds")
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{label_text} {getattr(self, field.name)}")
+        return "\n".join(lines) + "\n"
+
+
+def start_timer(counters: Optional[SearchCounters]) -> float:
+    return perf_counter() if counters is not None else 0.0
+
+
+def stop_timer(counters: Optional[SearchCounters], field: str, start: float) -> None:
+    if counters is not None:
+        setattr(counters, field, getattr(counters, field) + perf_counter() - start)
+
+
+def emit_metrics(
+    counters: SearchCounters,
+    destination: str = "-",
+    metrics_format: str = "json",
+    labels: Optional[Dict[str, str]] = None,
+) -> None:
+    if metrics_format == "json":
+        text = counters.to_json_line(labels) + "\n"
+    elif metrics_format == "prometheus":
+        text = counters.to_prometheus(labels)
+    else:
+        raise ValueError(f"Unknown metrics format {metrics_format}")
+
+    if destination == "-":
+        sys.stdout.write(text)
+        return
+    with open(destination, "a") as metrics_file:
+        metrics_file.write(text)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .compact_graph import CompactGraph
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
+
+
+@dataclass
+class EdgeAttributes:
+    # OSM u, v and multi-edge key of every CSR edge, and the bearings at which it
+    # leaves u and arrives at v. Routing never reads them, so they live beside the
+    # compact graph instead of in it.
+    keys: np.ndarray
+    leaving_bearings: np.ndarray
+    arriving_bearings: np.ndarray
+
+
+def bearing(
+    x_from: np.ndarray, y_from: np.ndarray, x_to: np.ndarray, y_to: np.ndarray
+) -> np.ndarray:
+    # Initial great-circle bearing in degrees, clockwise from north.
+    latitude_from = np.radians(y_from)
+    latitude_to = np.radians(y_to)
+    delta_longitude = np.radians(np.asarray(x_to) - np.asarray(x_from))
+    return np.degrees(
+        np.arctan2(
+            np.sin(delta_longitude) * np.cos(latitude_to),
+            np.cos(latitude_from) * np.sin(latitude_to)
+            - np.sin(latitude_from) * np.cos(latitude_to) * np.cos(delta_longitude),
+        )
+    )
+
+
+def edge_attributes(G: MultiDiGraph, graph: CompactGraph) -> EdgeAttributes:
+    # Every CSR row keeps the out-edges of its node in MultiDiGraph order, also
+    # after permute_nodes, so walking the rows recovers the keys of any node order.
+    keys = np.empty((graph.edge_count, 3), dtype=np.int64)
+    # First and last segment of every edge as (x0, y0, x1, y1).
+    leaving = np.empty((graph.edge_count, 4), dtype=np.float64)
+    arriving = np.empty((graph.edge_count, 4), dtype=np.float64)
+    position = 0
+    for node in graph.node_ids.tolist():
+        for u, v, key, edge_data in G.edges(node, keys=True, data=True):
+            keys[position] = (u, v, key)
+            geometry = edge_data.get("geometry")
+            if geometry is None:
+                points = [
+                    (G.nodes[u]["x"], G.nodes[u]["y"]),
+                    (G.nodes[v]["x"], G.nodes[v]["y"]),
+                ]
+            else:
+                points = list(geometry.coords)
+            leaving[position] = (*points[0], *points[1])
+            arriving[position] = (*points[-2], *points[-1])
+            position += 1
+    if position != graph.edge_count or not np.array_equal(
+        keys[:, 1], graph.node_ids[graph.indices]
+    ):
+        raise ValueError("The compact graph was not built from this graph")
+    return EdgeAttributes(
+        keys=keys,
+        leaving_bearings=bearing(*leaving.T),
+        arriving_bearings=bearing(*arriving.T),
+    )
@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+# OSM stores coordinates with seven decimals, so this fixed point loses nothing.
+COORDINATE_SCALE = 10_000_000
+
+
+def to_fixed(degrees: np.ndarray) -> np.ndarray:
+    return np.round(np.asarray(degrees, dtype=np.float64) * COORDINATE_SCALE).astype(
+        np.int32
+    )
+
+
+def from_fixed(fixed: np.ndarray) -> np.ndarray:
+    return fixed / COORDINATE_SCALE
+
+
+@dataclass
+class NodeIdMap:
+    node_ids: np.ndarray
+    sorted_ids: np.ndarray
+    sorted_dense: np.ndarray
+
+    @classmethod
+    def from_node_ids(cls, node_ids: np.ndarray) -> "NodeIdMap":
+        if len(node_ids) > np.iinfo(np.uint32).max:
+            raise ValueError("Dense node ids are limited to 32 bits")
+        order = np.argsort(node_ids, kind="stable")
+        return cls(node_ids, node_ids[order], order.astype(np.uint32))
+
+    def to_dense(self, osm_ids: Iterable[int]) -> np.ndarray:
+        osm_ids = np.asarray(osm_ids, dtype=np.int64)
+        positions = np.searchsorted(self.sorted_ids, osm_ids)
+        positions = np.minimum(positions, len(self.sorted_ids) - 1)
+        found = self.sorted_ids[positions] == osm_ids
+        if not found.all():
+            raise KeyError(int(osm_ids[~found][0]))
+        return self.sorted_dense[positions]
+
+    def to_osm(self, dense_ids: Iterable[int]) -> np.ndarray:
+        return self.node_ids[np.asarray(dense_ids, dtype=np.int64)]
+
+    def dense(self, osm_id: int) -> int:
+        return int(self.to_dense([osm_id])[0])
+
+    def osm(self, dense_id: int) -> int:
+        return int(self.node_ids[dense_id])
@@ -0,0 +1,123 @@
+import argparse
+from collections import deque
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from .compact_graph import CompactGraph, permute_nodes
+
+CURVE_BITS = 16
+
+
+def grid_coordinates(
+    graph: CompactGraph, bits: int = CURVE_BITS
+) -> Tuple[np.ndarray, np.ndarray]:
+    cells = (1 << bits) - 1
+    columns = graph.x_fixed.astype(np.int64) - graph.x_fixed.min()
+    rows = graph.y_fixed.astype(np.int64) - graph.y_fixed.min()
+    span = max(int(columns.max()), int(rows.max()), 1)
+    return columns * cells // span, rows * cells // span
+
+
+def hilbert_keys(
+    columns: np.ndarray, rows: np.ndarray, bits: int = CURVE_BITS
+) -> np.ndarray:
+    side = 1 << bits
+    x, y = columns.copy(), rows.copy()
+    keys = np.zeros(len(x), dtype=np.int64)
+    step = side >> 1
+    while step > 0:
+        rx = (x & step) > 0
+        ry = (y & step) > 0
+        keys += step * step * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous at the next level.
+        flip = ~ry & rx
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        step >>= 1
+    return keys
+
+
+def morton_keys(
+    columns: np.ndarray, rows: np.ndarray, bits: int = CURVE_BITS
+) -> np.ndarray:
+    keys = np.zeros(len(columns), dtype=np.int64)
+    for bit in range(bits):
+        keys |= ((columns >> bit) & 1) << (2 * bit)
+        keys |= ((rows >> bit) & 1) << (2 * bit + 1)
+    return keys
+
+
+def hilbert_order(graph: CompactGraph) -> np.ndarray:
+    return np.argsort(hilbert_keys(*grid_coordinates(graph)), kind="stable")
+
+
+def morton_order(graph: CompactGraph) -> np.ndarray:
+    return np.argsort(morton_keys(*grid_coordinates(graph)), kind="stable")
+
+
+def bfs_order(graph: CompactGraph) -> np.ndarray:
+    # Breadth-first over the undirected road network, starting each component at
+    # its first node in Hilbert order so components stay spatially grouped too.
+    indptr, indices, _ = graph.adjacency
+    reverse_indptr, reverse_edges, edge_sources = graph.reverse_adjacency
+    visited = [False] * graph.node_count
+    order = []
+    for start in hilbert_order(graph).tolist():
+        if visited[start]:
+            continue
+        visited[start] = True
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            neighbours = indices[indptr[node] : indptr[node + 1]] + [
+                edge_sources[edge]
+                for edge in reverse_edges[
+                    reverse_indptr[node] : reverse_indptr[node + 1]
+                ]
+            ]
+            for neighbour in neighbours:
+                if not visited[neighbour]:
+                    visited[neighbour] = True
+                    queue.append(neighbour)
+    return np.array(order, dtype=np.int64)
+
+
+def random_order(graph: CompactGraph, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).permutation(graph.node_count)
+
+
+map_to_node_orders: Dict[str, Callable[[CompactGraph], np.ndarray]] = {
+    "hilbert": hilbert_order,
+    "morton": morton_order,
+    "bfs": bfs_order,
+    "random": random_order,
+}
+
+
+def reorder_compact_graph(graph: CompactGraph, method: str = "hilbert") -> CompactGraph:
+    return permute_nodes(graph, map_to_node_orders[method](graph))
+
+
+if __name__ == "__main__":
+    from ..batch import load_compact_graph_for_batch
+    from .compact_graph import save_compact_graph
+
+    parser = argparse.ArgumentParser(
+        prog="NodeOrder",
+        description="Renumber the nodes of a compact graph for memory locality",
+    )
+    parser.add_argument("output", type=str, help="compact graph to write (.npz)")
+    parser.add_argument("-l", "--location", type=str)
+    parser.add_argument("--graphml", type=str)
+    parser.add_argument("--graph", type=str, help="saved compact graph (.npz)")
+    parser.add_argument("--order", choices=list(map_to_node_orders), default="hilbert")
+    args = parser.parse_args()
+    if args.location is None and args.graphml is None and args.graph is None:
+        parser.error("one of --location, --graphml or --graph is required")
+
+    graph = load_compact_graph_for_batch(args.location, args.graphml, args.graph)
+    save_compact_graph(reorder_compact_graph(graph, args.order), args.output)
+    print(f"Graph in {args.order} order written to {args.output}")
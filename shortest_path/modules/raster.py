@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import struct
+import weakref
+import zlib
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .node_ids import NodeIdMap
+from .simple_graph import Node
+from .utils import EDGE_STYLES, edge_style_codes
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
+
+BACKGROUND = (0.0, 0.0, 0.0)
+FIGURE_INCHES = 8
+POINTS_PER_INCH = 72
+ALPHA_LEVELS = 16
+# ax.set_title(color="#3b528b", fontsize=10) of the matplotlib frames.
+TITLE_COLOR = (0.231373, 0.321569, 0.545098)
+TITLE_POINTS = 10
+
+_graph_canvases: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def square_offsets(width: int) -> np.ndarray:
+    steps = np.arange(width) - (width - 1) // 2
+    rows, cols = np.meshgrid(steps, steps, indexing="ij")
+    return np.stack([rows.ravel(), cols.ravel()], axis=1)
+
+
+def disk_offsets(radius: float) -> np.ndarray:
+    offsets = square_offsets(2 * int(np.ceil(radius)) + 1)
+    return offsets[(offsets**2).sum(axis=1) <= radius**2 + 0.25]
+
+
+class RasterCanvas:
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        edge_sources: np.ndarray,
+        edge_targets: np.ndarray,
+        width: int = 2048,
+        margin: float = 0.02,
+    ):
+        # Same equirectangular aspect as ox.plot_graph on unprojected graphs.
+        coslat = np.cos(np.deg2rad((y.min() + y.max()) / 2))
+        projected_x = (x - x.min()) * coslat
+        projected_y = y.max() - y
+        extent = max(projected_x.max(), projected_y.max(), 1e-12)
+        inner_width = width * (1 - 2 * margin)
+        scale = inner_width / extent
+        self.width = width
+        self.height = int(np.ceil(projected_y.max() * scale + 2 * width * margin)) + 1
+        self.node_columns = projected_x * scale + width * margin
+        self.node_rows = projected_y * scale + width * margin
+
+        column_start = self.node_columns[edge_sources]
+        row_start = self.node_rows[edge_sources]
+        column_delta = self.node_columns[edge_targets] - column_start
+        row_delta = self.node_rows[edge_targets] - row_start
+        span = np.maximum(np.abs(column_delta), np.abs(row_delta))
+        samples = np.ceil(span).astype(np.int64) + 1
+        self.sample_edges = np.repeat(
+            np.arange(len(edge_sources), dtype=np.int32), samples
+        )
+        first_sample = np.repeat(np.cumsum(samples) - samples, samples)
+        steps = np.repeat(np.maximum(samples - 1, 1), samples)
+        self.sample_positions = np.arange(len(self.sample_edges)) - first_sample
+        self.sample_positions[np.cumsum(samples) - 1] = 0
+        t = (np.arange(len(self.sample_edges)) - first_sample) / steps
+        columns = np.rint(
+            column_start[self.sample_edges] + t * column_delta[self.sample_edges]
+        ).astype(np.int64)
+        rows = np.rint(
+            row_start[self.sample_edges] + t * row_delta[self.sample_edges]
+        ).astype(np.int64)
+        self.sample_pixels = (rows * self.width + columns).astype(np.int64)
+
+    def blank(self, background: Sequence[float] = BACKGROUND) -> np.ndarray:
+        image = np.zeros((self.height * self.width, 3), dtype=np.float32)
+        if any(background):
+            image[:] = background
+        return image
+
+    def _blend(
+        self,
+        image: np.ndarray,
+        pixels: np.ndarray,
+        colors: np.ndarray,
+        alpha: float,
+        offsets: np.ndarray,
+    ) -> None:
+        rows = pixels // self.width
+        columns = pixels % self.width
+        rows = (rows[:, None] + offsets[None, :, 0]).ravel()
+        columns = (columns[:, None] + offsets[None, :, 1]).ravel()
+        colors = np.repeat(colors, len(offsets), axis=0)
+        inside = (
+            (rows >= 0) & (rows < self.height) & (columns >= 0) & (columns < self.width)
+        )
+        # Every duplicate pixel blends against the same previous value and the
+        # last write wins, so overlapping samples of one layer blend only once.
+        pixels = rows[inside] * self.width + columns[inside]
+        image[pixels] = image[pixels] * (1 - alpha) + colors[inside] * alpha
+
+    def draw_edges(
+        self,
+        image: np.ndarray,
+        colors: np.ndarray,
+        alphas: np.ndarray,
+        linewidths: np.ndarray,
+    ) -> None:
+        # Blending is vectorized per (alpha, width) layer, drawn from the most
+        # transparent layer up so paths end on top like in the matplotlib plots.
+        levels = np.rint(np.asarray(alphas) * (ALPHA_LEVELS - 1)).astype(np.int64)
+        linewidths = np.maximum(np.rint(linewidths), 1).astype(np.int64)
+        sample_levels = levels[self.sample_edges]
+        sample_widths = linewidths[self.sample_edges]
+        for level in np.unique(levels):
+            if level == 0:
+                continue
+            in_level = sample_levels == level
+            for linewidth in np.unique(sample_widths[in_level]):
+                # Squares of the line width overlap when stamped every half
+                # width, and the last sample of every edge always stays in.
+                stride = max(1, int(linewidth) // 2)
+                selected = in_level & (sample_widths == linewidth)
+                if stride > 1:
+                    selected &= self.sample_positions % stride == 0
+                self._blend(
+                    image,
+                    self.sample_pixels[selected],
+                    colors[self.sample_edges[selected]],
+                    level / (ALPHA_LEVELS - 1),
+                    square_offsets(linewidth),
+                )
+
+    def draw_nodes(
+        self,
+        image: np.ndarray,
+        nodes: np.ndarray,
+        colors: np.ndarray,
+        alpha: float,
+        radius: float,
+    ) -> None:
+        if len(nodes) == 0:
+            return
+        rows = np.rint(self.node_rows[nodes]).astype(np.int64)
+        columns = np.rint(self.node_columns[nodes]).astype(np.int64)
+        pixels = rows * self.width + columns
+        self._blend(image, pixels, colors, alpha, disk_offsets(radius))
+
+    def to_rgb(self, image: np.ndarray) -> np.ndarray:
+        return (
+            np.clip(image * 255 + 0.5, 0, 255)
+            .astype(np.uint8)
+            .reshape(self.height, self.width, 3)
+        )
+
+
+def write_png(
+    filepath: str, image: np.ndarray, text: Optional[Dict[str, str]] = None
+) -> None:
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + chunk_type
+            + data
+            + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+        )
+
+    height, width, _ = image.shape
+    rows = np.concatenate(
+        [np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width * 3)],
+        axis=1,
+    )
+    chunks: List[bytes] = [
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    ]
+    for keyword, value in (text or {}).items():
+        chunks.append(chunk(b"tEXt", f"{keyword}\0{value}".encode("latin-1")))
+    chunks.append(chunk(b"IDAT", zlib.compress(rows.tobytes(), 1)))
+    chunks.append(chunk(b"IEND", b""))
+    with open(filepath, "wb") as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n" + b"".join(chunks))
+
+
+def points_to_pixels(points: float, dpi: int) -> float:
+    return points * dpi / POINTS_PER_INCH
+
+
+@lru_cache(maxsize=None)
+def title_font():
+    from matplotlib import font_manager
+    from matplotlib.ft2font import FT2Font
+
+    return FT2Font(font_manager.findfont("DejaVu Sans"))
+
+
+def title_band(
+    lines: List[str], width: int, dpi: int, background: Sequence[float] = BACKGROUND
+) -> np.ndarray:
+    # Centered lines of text, rasterized by FreeType into a band that is stacked on
+    # top of the frame where the matplotlib plots put their title.
+    font = title_font()
+    font.set_size(TITLE_POINTS, dpi)
+    line_height = int(np.ceil(points_to_pixels(TITLE_POINTS, dpi) * 1.2))
+    band = np.empty((line_height * (len(lines) + 1), width, 3), dtype=np.float32)
+    band[:] = background
+    for number, line in enumerate(lines):
+        font.set_text(line, 0.0)
+        font.draw_glyphs_to_bitmap(antialiased=True)
+        coverage = np.asarray(font.get_image(), dtype=np.float32)[
+            :line_height, :width, None
+        ] / np.float32(255)
+        height, text_width, _ = coverage.shape
+        top = line_height // 2 + number * line_height
+        left = (width - text_width) // 2
+        region = band[top : top + height, left : left + text_width]
+        region[:] = region * (1 - coverage) + np.array(TITLE_COLOR) * coverage
+    return np.clip(band * 255 + 0.5, 0, 255).astype(np.uint8)
+
+
+def graph_canvas(graph: MultiDiGraph, dpi: int) -> RasterCanvas:
+    cached = _graph_canvases.get(graph)
+    if cached is not None and cached[0] == dpi:
+        return cached[1]
+    id_map = NodeIdMap.from_node_ids(
+        np.fromiter(graph.nodes, dtype=np.int64, count=len(graph))
+    )
+    x = np.array([graph.nodes[node]["x"] for node in graph.nodes], dtype=np.float64)
+    y = np.array([graph.nodes[node]["y"] for node in graph.nodes], dtype=np.float64)
+    edge_nodes = np.array([(u, v) for u, v, _ in graph.edges], dtype=np.int64)
+    edge_sources = id_map.to_dense(edge_nodes[:, 0])
+    edge_targets = id_map.to_dense(edge_nodes[:, 1])
+    canvas = RasterCanvas(x, y, edge_sources, edge_targets, width=FIGURE_INCHES * dpi)
+    _graph_canvases[graph] = (dpi, canvas)
+    return canvas
+
+
+def plot_graph_raster(
+    graph: MultiDiGraph,
+    simple_graph: Dict[int, Node],
+    iteration: int,
+    algorithm: str = "default",
+    time: Optional[float] = None,
+    dist: Optional[float] = None,
+    dpi: int = 256,
+) -> None:
+    from matplotlib.colors import to_rgba_array
+
+    node_colors = {"source": "blue", "destination": "red", "default": "white"}
+    canvas = graph_canvas(graph, dpi)
+    image = canvas.blank()
+    _, codes = edge_style_codes(graph)
+    canvas.draw_edges(
+        image,
+        np.array([style.color[:3] for style in EDGE_STYLES])[codes],
+        np.array([style.alpha for style in EDGE_STYLES])[codes],
+        points_to_pixels(np.array([style.linewidth for style in EDGE_STYLES]), dpi)[
+            codes
+        ],
+    )
+    nodes = [simple_graph[node] for node in graph.nodes]
+    # Marker sizes are areas in points^2, so the radius is half the square root.
+    for size, alpha in sorted({(node.size, node.alpha) for node in nodes}):
+        selected = np.array(
+            [node.size == size and node.alpha == alpha for node in nodes]
+        )
+        canvas.draw_nodes(
+            image,
+            np.flatnonzero(selected),
+            to_rgba_array(
+                [
+                    node_colors.get(node.node_type, "white")
+                    for node, is_selected in zip(nodes, selected)
+                    if is_selected
+                ]
+            )[:, :3],
+            alpha,
+            points_to_pixels(np.sqrt(size) / 2, dpi),
+        )
+    titles = {
+        title_name: str(title_value)
+        for (title_name, title_value) in [
+            ("Iteration", iteration),
+            ("Time", time),
+            ("Distance", dist),
+        ]
+        if title_value is not None
+    }
+    title = title_band(
+        [f"{title_name}: {title_value}" for title_name, title_value in titles.items()],
+        canvas.width,
+        dpi,
+    )
+    write_png(
+        f"./assets/{algorithm}.png",
+        np.concatenate([title, canvas.to_rgb(image)]),
+        text=titles,
+    )
+
+
+def plot_heatmap_raster(
+    x: np.ndarray,
+    y: np.ndarray,
+    edge_sources: np.ndarray,
+    edge_targets: np.ndarray,
+    uses: np.ndarray,
+    filepath: str,
+    dpi: int = 512,
+    linewidth: float = 1.0,
+    cmap: str = "hot",
+) -> None:
+    from matplotlib import colormaps
+
+    # Edges are drawn from the least to the most used one so hot roads stay on top.
+    order = np.argsort(uses, kind="stable")
+    canvas = RasterCanvas(
+        x, y, edge_sources[order], edge_targets[order], width=FIGURE_INCHES * dpi
+    )
+    image = canvas.blank()
+    values = np.log1p(uses[order].astype(np.float64))
+    values = values / values.max() if values.max() > 0 else values
+    canvas.draw_edges(
+        image,
+        colormaps[cmap](values)[:, :3],
+        np.ones(len(order)),
+        np.full(len(order), points_to_pixels(linewidth, dpi)),
+    )
+    write_png(filepath, canvas.to_rgb(image))
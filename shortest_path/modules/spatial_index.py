@@ -0,0 +1,99 @@
+from typing import Tuple
+
+import numpy as np
+
+from .compact_graph import CompactGraph
+from .node_ids import from_fixed
+
+EARTH_RADIUS_M = 6_371_009
+EDGE_SAMPLE_SPACING_M = 50.0
+
+
+class SpatialIndex:
+    def __init__(self, graph: CompactGraph):
+        from sklearn.neighbors import BallTree
+
+        self.graph = graph
+        self.tree = BallTree(np.radians(np.c_[graph.y, graph.x]), metric="haversine")
+        self.edge_tree = None
+        self.sample_edges = None
+
+    def nearest_nodes(
+        self, latitudes: np.ndarray, longitudes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        points = np.radians(np.c_[latitudes, longitudes])
+        distances, nodes = self.tree.query(points, k=1)
+        return nodes[:, 0], distances[:, 0] * EARTH_RADIUS_M
+
+    def build_edge_tree(self) -> None:
+        from sklearn.neighbors import BallTree
+
+        # Edges are indexed by points sampled along them, so a radius query grown by
+        # half the spacing finds every edge passing within the radius.
+        graph = self.graph
+        x, y = graph.x, graph.y
+        samples = np.maximum(1, np.ceil(graph.length / EDGE_SAMPLE_SPACING_M))
+        samples = samples.astype(np.int64)
+        self.sample_edges = np.repeat(np.arange(graph.edge_count), samples)
+        offsets = np.arange(len(self.sample_edges)) - np.repeat(
+            np.cumsum(samples) - samples, samples
+        )
+        fractions = (offsets + 0.5) / samples[self.sample_edges]
+        sources = graph.edge_sources[self.sample_edges]
+        targets = graph.indices[self.sample_edges]
+        latitudes = y[sources] + (y[targets] - y[sources]) * fractions
+        longitudes = x[sources] + (x[targets] - x[sources]) * fractions
+        self.edge_tree = BallTree(
+            np.radians(np.c_[latitudes, longitudes]), metric="haversine"
+        )
+
+    def candidate_edges(
+        self,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        radius: float,
+        max_candidates: int,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if self.edge_tree is None:
+            self.build_edge_tree()
+        graph = self.graph
+        query_radius = (radius + EDGE_SAMPLE_SPACING_M / 2) / EARTH_RADIUS_M
+        matches = self.edge_tree.query_radius(
+            np.radians(np.c_[latitudes, longitudes]), r=query_radius
+        )
+        counts = np.fromiter((len(match) for match in matches), dtype=np.int64)
+        points = np.repeat(np.arange(len(matches)), counts)
+        edges = self.sample_edges[np.concatenate([*matches, np.empty(0, np.int64)])]
+        pairs = np.unique(points * graph.edge_count + edges)
+        points, edges = pairs // graph.edge_count, pairs % graph.edge_count
+
+        # Project every point onto its candidate segments in a local equirectangular
+        # frame centred on the point, which is accurate at GPS noise distances.
+        metres_per_degree = np.radians(1.0) * EARTH_RADIUS_M
+        scale = np.cos(np.radians(latitudes[points])) * metres_per_degree
+        sources = graph.edge_sources[edges]
+        targets = graph.indices[edges]
+        point_x, point_y = longitudes[points], latitudes[points]
+        source_x = (from_fixed(graph.x_fixed[sources]) - point_x) * scale
+        source_y = (from_fixed(graph.y_fixed[sources]) - point_y) * metres_per_degree
+        delta_x = (from_fixed(graph.x_fixed[targets]) - point_x) * scale - source_x
+        delta_y = (
+            from_fixed(graph.y_fixed[targets]) - point_y
+        ) * metres_per_degree - source_y
+        squared_length = np.maximum(delta_x**2 + delta_y**2, 1e-12)
+        fractions = np.clip(
+            -(source_x * delta_x + source_y * delta_y) / squared_length, 0.0, 1.0
+        )
+        distances = np.hypot(
+            source_x + fractions * delta_x, source_y + fractions * delta_y
+        )
+
+        keep = distances <= radius
+        points, edges = points[keep], edges[keep]
+        distances, fractions = distances[keep], fractions[keep]
+        order = np.lexsort((distances, points))
+        points, edges = points[order], edges[order]
+        distances, fractions = distances[order], fractions[order]
+        rank = np.arange(len(points)) - np.searchsorted(points, points)
+        keep = rank < max_candidates
+        return points[keep], edges[keep], distances[keep], fractions[keep]
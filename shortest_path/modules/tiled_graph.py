@@ -0,0 +1,220 @@
+import json
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .compact_graph import CompactGraph, permute_nodes
+from .node_ids import NodeIdMap, from_fixed
+from .node_order import grid_coordinates, hilbert_keys
+
+MAGIC = b"MAPTILES"
+VERSION = 2
+ALIGNMENT = 64
+
+ARRAY_DTYPES: Dict[str, str] = {
+    "node_ids": "<i8",
+    "sorted_ids": "<i8",
+    "sorted_dense": "<u4",
+    "x_fixed": "<i4",
+    "y_fixed": "<i4",
+    "indptr": "<i8",
+    "indices": "<u4",
+    "weight": "<f8",
+    "length": "<f8",
+}
+
+
+@dataclass
+class Tile:
+    node_start: int
+    indptr: List[int]
+    indices: List[int]
+    weights: List[float]
+    x: List[float]
+    y: List[float]
+
+
+def tile_keys(x: np.ndarray, y: np.ndarray, tile_size: float) -> np.ndarray:
+    columns = np.floor(x / tile_size).astype(np.int64)
+    rows = np.floor(y / tile_size).astype(np.int64)
+    return np.stack([columns, rows], axis=1)
+
+
+def write_tiled_graph(graph: CompactGraph, path: str, tile_size: float = 0.05) -> None:
+    keys = tile_keys(graph.x, graph.y, tile_size)
+    # Nodes are renumbered tile by tile, so every tile is one contiguous slice of
+    # each array and the tile of a node is found by bisecting the tile starts.
+    # Inside a tile they follow the Hilbert curve.
+    curve = hilbert_keys(*grid_coordinates(graph))
+    order = np.lexsort((curve, keys[:, 1], keys[:, 0]))
+    tiled = permute_nodes(graph, order)
+    id_map = NodeIdMap.from_node_ids(tiled.node_ids)
+    arrays = {
+        "node_ids": id_map.node_ids,
+        "sorted_ids": id_map.sorted_ids,
+        "sorted_dense": id_map.sorted_dense,
+        "x_fixed": tiled.x_fixed,
+        "y_fixed": tiled.y_fixed,
+        "indptr": tiled.indptr,
+        "indices": tiled.indices,
+        "weight": tiled.weight,
+        "length": tiled.length,
+    }
+
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.any(np.diff(sorted_keys, axis=0) != 0, axis=1)) + 1
+    tile_starts = np.concatenate([[0], boundaries]).astype(np.int64)
+    tiles = [
+        {"key": sorted_keys[start].tolist(), "node_start": int(start)}
+        for start in tile_starts
+    ]
+
+    offsets: Dict[str, int] = dict()
+    header = {
+        "version": VERSION,
+        "node_count": graph.node_count,
+        "edge_count": graph.edge_count,
+        "tile_size": tile_size,
+        "max_speed": float(graph.maxspeed.max()),
+        "tiles": tiles,
+        "arrays": offsets,
+    }
+    # The array offsets depend on the header length, so settle both together.
+    while True:
+        header_bytes = json.dumps(header).encode()
+        position = len(MAGIC) + 8 + len(header_bytes)
+        for name, array in arrays.items():
+            position += -position % ALIGNMENT
+            offsets[name] = position
+            position += array.nbytes
+        if json.dumps(header).encode() == header_bytes:
+            break
+
+    with open(path, "wb") as tiled_file:
+        tiled_file.write(MAGIC)
+        tiled_file.write(np.uint64(len(header_bytes)).tobytes())
+        tiled_file.write(header_bytes)
+        for name, array in arrays.items():
+            tiled_file.write(b"\0" * (offsets[name] - tiled_file.tell()))
+            tiled_file.write(np.ascontiguousarray(array, dtype=ARRAY_DTYPES[name]))
+
+
+class TiledGraph:
+    def __init__(self, path: str, max_resident_tiles: int = 64):
+        with open(path, "rb") as tiled_file:
+            if tiled_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a tiled graph")
+            header_length = int(np.frombuffer(tiled_file.read(8), dtype="<u8")[0])
+            header = json.loads(tiled_file.read(header_length))
+        if header["version"] != VERSION:
+            raise ValueError(f"{path} has tiled graph version {header['version']}")
+        self.node_count: int = header["node_count"]
+        self.edge_count: int = header["edge_count"]
+        self.tile_size: float = header["tile_size"]
+        self.max_speed: float = header["max_speed"]
+        self.tile_starts: List[int] = [tile["node_start"] for tile in header["tiles"]]
+        self.tile_by_key: Dict[Tuple[int, int], int] = {
+            tuple(tile["key"]): number for number, tile in enumerate(header["tiles"])
+        }
+
+        self.mmap = np.memmap(path, dtype=np.uint8, mode="r")
+        lengths = {
+            "node_ids": self.node_count,
+            "sorted_ids": self.node_count,
+            "sorted_dense": self.node_count,
+            "x_fixed": self.node_count,
+            "y_fixed": self.node_count,
+            "indptr": self.node_count + 1,
+            "indices": self.edge_count,
+            "weight": self.edge_count,
+            "length": self.edge_count,
+        }
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.frombuffer(
+                self.mmap,
+                dtype=ARRAY_DTYPES[name],
+                count=lengths[name],
+                offset=header["arrays"][name],
+            )
+            for name in ARRAY_DTYPES
+        }
+        self.id_map = NodeIdMap(
+            self.arrays["node_ids"],
+            self.arrays["sorted_ids"],
+            self.arrays["sorted_dense"],
+        )
+
+        self.max_resident_tiles = max_resident_tiles
+        self.resident_tiles: "OrderedDict[int, Tile]" = OrderedDict()
+        self.tile_faults = 0
+        self.tile_evictions = 0
+
+    @property
+    def tile_count(self) -> int:
+        return len(self.tile_starts)
+
+    def tile_of(self, node: int) -> int:
+        return bisect_right(self.tile_starts, node) - 1
+
+    def tile_range(self, tile_number: int) -> Tuple[int, int]:
+        start = self.tile_starts[tile_number]
+        if tile_number + 1 < self.tile_count:
+            return start, self.tile_starts[tile_number + 1]
+        return start, self.node_count
+
+    def tile(self, tile_number: int) -> Tile:
+        tile = self.resident_tiles.get(tile_number)
+        if tile is not None:
+            self.resident_tiles.move_to_end(tile_number)
+            return tile
+        self.tile_faults += 1
+        node_start, node_end = self.tile_range(tile_number)
+        indptr = self.arrays["indptr"][node_start : node_end + 1]
+        edge_start, edge_end = int(indptr[0]), int(indptr[-1])
+        tile = Tile(
+            node_start=node_start,
+            indptr=(indptr - edge_start).tolist(),
+            indices=self.arrays["indices"][edge_start:edge_end].tolist(),
+            weights=self.arrays["weight"][edge_start:edge_end].tolist(),
+            x=from_fixed(self.arrays["x_fixed"][node_start:node_end]).tolist(),
+            y=from_fixed(self.arrays["y_fixed"][node_start:node_end]).tolist(),
+        )
+        self.resident_tiles[tile_number] = tile
+        while len(self.resident_tiles) > self.max_resident_tiles:
+            self.resident_tiles.popitem(last=False)
+            self.tile_evictions += 1
+        return tile
+
+    def node_tile(self, node: int) -> Tile:
+        return self.tile(self.tile_of(node))
+
+    def coordinates(self, node: int) -> Tuple[float, float]:
+        tile = self.node_tile(node)
+        local = node - tile.node_start
+        return tile.x[local], tile.y[local]
+
+    def corridor_tiles(
+        self, source: int, destination: int, width: int = 1
+    ) -> List[int]:
+        source_x, source_y = self.coordinates(source)
+        destination_x, destination_y = self.coordinates(destination)
+        start = np.floor(np.array([source_x, source_y]) / self.tile_size)
+        end = np.floor(np.array([destination_x, destination_y]) / self.tile_size)
+        steps = int(np.abs(end - start).max()) + 1
+        corridor: List[int] = []
+        for point in np.linspace(start, end, steps).round().astype(np.int64):
+            for column in range(point[0] - width, point[0] + width + 1):
+                for row in range(point[1] - width, point[1] + width + 1):
+                    tile_number = self.tile_by_key.get((column, row))
+                    if tile_number is not None and tile_number not in corridor:
+                        corridor.append(tile_number)
+        return corridor
+
+    def prefetch_corridor(self, source: int, destination: int, width: int = 1) -> None:
+        for tile_number in self.corridor_tiles(source, destination, width)[
+            : self.max_resident_tiles
+        ]:
+            self.tile(tile_number)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .compact_graph import CompactGraph
+from .edge_attributes import EdgeAttributes, bearing, edge_attributes
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+TurnRestrictions = Tuple[Set[Tuple[int, int]], Dict[int, Set[int]]]
+
+
+@dataclass
+class TurnCostModel:
+    graph: CompactGraph
+    # Without attributes the bearings fall back to the chord between the end nodes.
+    attributes: Optional[EdgeAttributes] = None
+    u_turn_seconds: float = 30.0
+    # Turns across the opposing traffic, left turns when driving on the right.
+    crossing_turn_seconds: float = 8.0
+    non_crossing_turn_seconds: float = 3.0
+    turn_angle: float = 45.0
+    u_turn_angle: float = 150.0
+    drive_on_right: bool = True
+    banned_turns: Set[Tuple[int, int]] = field(default_factory=set)
+    only_turns: Dict[int, Set[int]] = field(default_factory=dict)
+
+    @cached_property
+    def chord_bearings(self) -> np.ndarray:
+        graph = self.graph
+        x, y = graph.x, graph.y
+        sources = graph.edge_sources
+        return bearing(x[sources], y[sources], x[graph.indices], y[graph.indices])
+
+    @cached_property
+    def leaving_bearings(self) -> List[float]:
+        if self.attributes is None:
+            return self.chord_bearings.tolist()
+        return self.attributes.leaving_bearings.tolist()
+
+    @cached_property
+    def arriving_bearings(self) -> List[float]:
+        if self.attributes is None:
+            return self.chord_bearings.tolist()
+        return self.attributes.arriving_bearings.tolist()
+
+    @cached_property
+    def edge_sources(self) -> List[int]:
+        return self.graph.edge_sources.tolist()
+
+    @cached_property
+    def edge_targets(self) -> List[int]:
+        return self.graph.indices.tolist()
+
+    def turn_cost(self, from_edge: int, to_edge: int) -> Optional[float]:
+        if (from_edge, to_edge) in self.banned_turns:
+            return None
+        allowed = self.only_turns.get(from_edge)
+        if allowed is not None and to_edge not in allowed:
+            return None
+
+        angle = (
+            self.leaving_bearings[to_edge] - self.arriving_bearings[from_edge] + 540
+        ) % 360 - 180
+        if (
+            self.edge_targets[to_edge] == self.edge_sources[from_edge]
+            or abs(angle) >= self.u_turn_angle
+        ):
+            seconds = self.u_turn_seconds
+        elif abs(angle) < self.turn_angle:
+            return 0.0
+        elif (angle > 0) == self.drive_on_right:
+            seconds = self.non_crossing_turn_seconds
+        else:
+            seconds = self.crossing_turn_seconds
+        return seconds / 3600
+
+
+def edges_by_way(G: MultiDiGraph, attributes: EdgeAttributes) -> Dict[int, List[int]]:
+    ways: Dict[int, List[int]] = dict()
+    for edge, edge_key in enumerate(attributes.keys.tolist()):
+        osmid = G.edges[tuple(edge_key)].get("osmid")
+        for way in osmid if isinstance(osmid, list) else [osmid]:
+            if way is not None:
+                ways.setdefault(int(way), []).append(edge)
+    return ways
+
+
+def turn_restrictions_from_relations(
+    G: MultiDiGraph,
+    graph: CompactGraph,
+    relations: List[Dict],
+    attributes: Optional[EdgeAttributes] = None,
+) -> TurnRestrictions:
+    if attributes is None:
+        attributes = edge_attributes(G, graph)
+    node_ids = graph.node_ids
+    sources = graph.edge_sources
+    ways = edges_by_way(G, attributes)
+    banned_turns: Set[Tuple[int, int]] = set()
+    only_turns: Dict[int, Set[int]] = dict()
+    for relation in relations:
+        restriction = relation.get("restriction", "")
+        via = relation.get("via")
+        if via is None:
+            continue
+        from_edges = [
+            edge
+            for edge in ways.get(relation.get("from"), [])
+            if node_ids[graph.indices[edge]] == via
+        ]
+        to_edges = [
+            edge
+            for edge in ways.get(relation.get("to"), [])
+            if node_ids[sources[edge]] == via
+        ]
+        # A to way outside the graph would otherwise leave an empty allow-set and
+        # ban every exit from the from edge.
+        if not to_edges:
+            continue
+        for from_edge in from_edges:
+            if restriction.startswith("no_"):
+                banned_turns.update((from_edge, to_edge) for to_edge in to_edges)
+            elif restriction.startswith("only_"):
+                only_turns.setdefault(from_edge, set()).update(to_edges)
+    return banned_turns, only_turns
+
+
+def fetch_turn_restrictions(graph: CompactGraph) -> List[Dict]:
+    import requests
+
+    y, x = graph.y, graph.x
+    south, north = float(y.min()), float(y.max())
+    west, east = float(x.min()), float(x.max())
+    query = (
+        "[out:json];"
+        f'relation["type"="restriction"]({south},{west},{north},{east});'
+        "out body;"
+    )
+    response = requests.post(OVERPASS_URL, data={"data": query})
+    response.raise_for_status()
+
+    relations: List[Dict] = []
+    for element in response.json().get("elements", []):
+        tags = element.get("tags", {})
+        restriction = tags.get("restriction", tags.get("restriction:motorcar"))
+        members = {
+            (member["role"], member["type"]): member["ref"]
+            for member in element.get("members", [])
+        }
+        # Restrictions through a via way are not supported, only via nodes.
+        if restriction is None or ("via", "node") not in members:
+            continue
+        relations.append(
+            {
+                "restriction": restriction,
+                "from": members.get(("from", "way")),
+                "via": members[("via", "node")],
+                "to": members.get(("to", "way")),
+            }
+        )
+    return relations
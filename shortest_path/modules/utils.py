@@ -1,31 +1,42 @@
-import osmnx as ox
-from networkx import MultiDiGraph
-from typing import Optional, Dict, List, Tuple
+from __future__ import annotations
+
+import weakref
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple
 from .simple_graph import Node, RawNode, NodeId, Edge, EdgeId, Graph
-import matplotlib.pyplot as plt
-from haversine import haversine
+from .counters import SearchCounters, start_timer, stop_timer
+
+if TYPE_CHECKING:
+    import numpy as np
+    from networkx import MultiDiGraph
+
+# numpy, osmnx, matplotlib and haversine are imported on first use so that importing
+# the routing code stays cheap; the colors are plt.cm.viridis at 0.25, 0.45, 0.7, 1.0.
 
 
 class UnvisitedEdge:
-    color = plt.cm.viridis(0.25)
+    code = 0
+    color = (0.229739, 0.322361, 0.545706, 1.0)
     alpha = 0.4
     linewidth = 0.4
 
 
 class VisitedEdge:
-    color = plt.cm.viridis(0.45)
+    code = 1
+    color = (0.144759, 0.519093, 0.556572, 1.0)
     alpha = 0.6
     linewidth = 0.5
 
 
 class ActiveEdge:
-    color = plt.cm.viridis(0.7)
+    code = 2
+    color = (0.266941, 0.748751, 0.440573, 1.0)
     alpha = 0.8
     linewidth = 0.6
 
 
 class PathEdge:
-    color = plt.cm.viridis(1.0)
+    code = 3
+    color = (0.993248, 0.906157, 0.143936, 1.0)
     alpha = 1.0
     linewidth = 0.7
 
@@ -37,31 +48,55 @@ POINT_SIZE = 18
 POINT_ALPHA = 1
 
 
+EDGE_STYLES = (UnvisitedEdge, VisitedEdge, ActiveEdge, PathEdge)
+
+_edge_styles: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def edge_style_codes(graph: MultiDiGraph) -> Tuple[Dict, np.ndarray]:
+    # Position of every edge in graph.edges order and the code of its last style,
+    # so raster frames index style tables instead of reading edge attributes.
+    styles = _edge_styles.get(graph)
+    if styles is None:
+        import numpy as np
+
+        styles = (
+            {edge: position for position, edge in enumerate(graph.edges)},
+            np.zeros(graph.number_of_edges(), dtype=np.int8),
+        )
+        _edge_styles[graph] = styles
+    return styles
+
+
+def style_edge(graph: MultiDiGraph, edge, style) -> None:
+    edge_data = graph.edges[edge]
+    edge_data["color"] = style.color
+    edge_data["alpha"] = style.alpha
+    edge_data["linewidth"] = style.linewidth
+    edge_positions, codes = edge_style_codes(graph)
+    codes[edge_positions[edge]] = style.code
+
+
 def style_unvisited_edge(graph: MultiDiGraph, edge) -> None:
-    graph.edges[edge]["color"] = UnvisitedEdge.color
-    graph.edges[edge]["alpha"] = UnvisitedEdge.alpha
-    graph.edges[edge]["linewidth"] = UnvisitedEdge.linewidth
+    style_edge(graph, edge, UnvisitedEdge)
 
 
 def style_visited_edge(graph: MultiDiGraph, edge) -> None:
-    graph.edges[edge]["color"] = VisitedEdge.color
-    graph.edges[edge]["alpha"] = VisitedEdge.alpha
-    graph.edges[edge]["linewidth"] = VisitedEdge.linewidth
+    style_edge(graph, edge, VisitedEdge)
 
 
 def style_active_edge(graph: MultiDiGraph, edge) -> None:
-    graph.edges[edge]["color"] = ActiveEdge.color
-    graph.edges[edge]["alpha"] = ActiveEdge.alpha
-    graph.edges[edge]["linewidth"] = ActiveEdge.linewidth
+    style_edge(graph, edge, ActiveEdge)
 
 
 def style_path_edge(graph: MultiDiGraph, edge) -> None:
-    graph.edges[edge]["color"] = PathEdge.color
-    graph.edges[edge]["alpha"] = PathEdge.alpha
-    graph.edges[edge]["linewidth"] = PathEdge.linewidth
+    style_edge(graph, edge, PathEdge)
 
 
 def plot_graph_raw(graph: MultiDiGraph, edges_in_path: List[EdgeId]):
+    import matplotlib.pyplot as plt
+    import osmnx as ox
+
     destination = edges_in_path[0][-1]
     source = edges_in_path[-1][0]
     ox.plot_graph(
@@ -122,7 +157,16 @@ def plot_graph(
     time: Optional[float] = None,
     dist: Optional[float] = None,
     dpi: int = 256,
+    raster: bool = False,
 ) -> None:
+    if raster:
+        from .raster import plot_graph_raster
+
+        plot_graph_raster(graph, simple_graph, iteration, algorithm, time, dist, dpi)
+        return
+    import matplotlib.pyplot as plt
+    import osmnx as ox
+
     node_colors = {"source": "blue", "destination": "red", "default": "white"}
     fig, ax = ox.plot_graph(
         graph,
@@ -157,13 +201,26 @@ def plot_graph(
     plt.close()
 
 
-def plot_heatmap(graph: MultiDiGraph, algorithm) -> None:
+def plot_heatmap(
+    graph: MultiDiGraph, algorithm, filepath: Optional[str] = None, dpi: int = 512
+) -> None:
+    import matplotlib.pyplot as plt
+    import osmnx as ox
+
     edge_colors = ox.plot.get_edge_colors_by_attr(
         graph, f"{algorithm}_uses", cmap="hot"
     )
     fig, _ = ox.plot_graph(
-        graph, node_size=0, edge_color=edge_colors, bgcolor="#000000"
+        graph,
+        node_size=0,
+        edge_color=edge_colors,
+        bgcolor="#000000",
+        show=filepath is None,
+        save=filepath is not None,
+        filepath=filepath,
+        dpi=dpi,
     )
+    plt.close()
 
 
 def reconstruct_path(
@@ -171,7 +228,9 @@ def reconstruct_path(
     simple_graph: Dict[int, Node],
     source: int,
     destination: int,
+    counters: Optional[SearchCounters] = None,
 ) -> Tuple[float, float]:
+    reconstruction_start = start_timer(counters)
     dist: float = 0
     time: float = 0
     current: int = destination
@@ -187,6 +246,7 @@ def reconstruct_path(
         #     edge_data[f"{algorithm}_uses"] = edge_data.get(f"{algorithm}_uses", 0) + 1
         current = previous
     time_sec = time * 60 * 60
+    stop_timer(counters, "reconstruction_time", reconstruction_start)
     print(f"Total dist = {dist} km")
     print(f"Total time = {int (time_sec // 60)} m {int(time_sec % 60)} sec")
     print(f"Speed average = {dist / time}")
@@ -194,6 +254,8 @@ def reconstruct_path(
 
 
 def find_nearest_node_from_point(graph: MultiDiGraph, latitude, longitude) -> int:
+    from haversine import haversine
+
     nearest_node: Optional[int] = None
     min_distance: Optional[float] = None
     for node in graph.nodes:
@@ -213,6 +275,8 @@ def find_nearest_node_from_point(graph: MultiDiGraph, latitude, longitude) -> in
 
 
 def find_distance_by_nodes(graph: MultiDiGraph, source, destination):
+    from haversine import haversine
+
     source_latitude = graph.nodes[source]["y"]
     source_longitude = graph.nodes[source]["x"]
     destination_latitude = graph.nodes[destination]["y"]
@@ -301,6 +365,8 @@ def convert_multidigraph_to_graph(graph: MultiDiGraph) -> Graph:
 
 
 def load_multidigraph(location: str) -> MultiDiGraph:
+    import osmnx as ox
+
     try:
         print("Loading graph...")
         G: MultiDiGraph = ox.graph_from_place(location, network_type="drive")
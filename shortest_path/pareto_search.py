@@ -0,0 +1,348 @@
+import argparse
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .compact_search import heuristic_to_destination
+from .modules.compact_graph import CompactGraph
+from .modules.counters import SearchCounters, start_timer, stop_timer
+
+MAX_LABELS = 8
+# Straight-line bounds are shrunk slightly so rounded edge lengths never make
+# them overestimate.
+BOUND_SLACK = 0.99
+
+# Weights of (hours, km); the economical one values a kilometre at two minutes.
+DEFAULT_WEIGHTINGS: Dict[str, Tuple[float, float]] = {
+    "fastest": (1.0, 0.0),
+    "shortest": (0.0, 1.0),
+    "economical": (1.0, 1 / 30),
+}
+
+Label = Tuple[float, float, List[int]]
+
+
+def distances_to_destination(graph: CompactGraph, destination: int) -> List[float]:
+    reverse_indptr, reverse_edges, edge_sources = graph.reverse_adjacency
+    lengths = graph.edge_lengths
+    distance_to_destination: List[float] = [float("inf")] * graph.node_count
+    visited_nodes: List[bool] = [False] * graph.node_count
+    distance_to_destination[destination] = 0.0
+    priority_queue = [(0.0, destination)]
+    while priority_queue:
+        current_distance, current_node = heapq.heappop(priority_queue)
+        if visited_nodes[current_node]:
+            continue
+        visited_nodes[current_node] = True
+        for position in range(
+            reverse_indptr[current_node], reverse_indptr[current_node + 1]
+        ):
+            edge = reverse_edges[position]
+            previous_node = edge_sources[edge]
+            new_distance = current_distance + lengths[edge] / 1000
+            if distance_to_destination[previous_node] > new_distance:
+                distance_to_destination[previous_node] = new_distance
+                heapq.heappush(priority_queue, (new_distance, previous_node))
+    return distance_to_destination
+
+
+def pareto_search(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    max_labels: Optional[int] = MAX_LABELS,
+    counters: Optional[SearchCounters] = None,
+) -> List[Label]:
+    # Labels carry (time, distance) and are settled in lexicographic order, so a
+    # label is dominated at its node exactly when an earlier one there was at least
+    # as short, and one running minimum per node replaces the label set scan.
+    # With max_labels, every node keeps its first label, the fastest, and any label
+    # on a shortest route, and spreads the others over max_labels - 2 buckets of
+    # route distance between the shortest route and its fastest label, one label
+    # per bucket. Prefixes of the fastest and shortest route are never dropped.
+    if max_labels is not None and max_labels < 3:
+        raise ValueError("max_labels must leave room for one bucket")
+    indptr, indices, weights = graph.adjacency
+    lengths = graph.edge_lengths
+    best_distance: List[float] = [float("inf")] * graph.node_count
+
+    heuristic_start = start_timer(counters)
+    time_bound = destination_bounds(graph, destination)[0].tolist()
+    # Exact remaining distances prune harder than straight lines and put every
+    # label on one axis of route distance.
+    distance_bound = distances_to_destination(graph, destination)
+    stop_timer(counters, "heuristic_time", heuristic_start)
+    shortest_route = distance_bound[source]
+    if shortest_route == float("inf"):
+        return []
+
+    buckets = 0 if max_labels is None else max_labels - 2
+    fastest_route: List[float] = [float("inf")] * graph.node_count
+    last_bucket: List[int] = [buckets] * graph.node_count
+
+    def is_capped(route_distance: float, node: int) -> bool:
+        # Labels on a shortest route, and every label without a cap, pass.
+        if max_labels is None or route_distance <= shortest_route * (1 + 1e-9):
+            return False
+        spread = fastest_route[node] - shortest_route
+        if spread == float("inf"):
+            return False
+        bucket = int((route_distance - shortest_route) / spread * buckets)
+        if bucket >= last_bucket[node]:
+            return True
+        last_bucket[node] = bucket
+        return False
+
+    label_node: List[int] = [source]
+    label_edge: List[int] = [-1]
+    label_parent: List[int] = [-1]
+    destination_labels: List[Tuple[float, float, int]] = []
+
+    def is_pruned(time: float, distance: float, node: int) -> bool:
+        if distance >= best_distance[node]:
+            return True
+        time += time_bound[node]
+        distance += distance_bound[node]
+        return any(
+            found_time <= time and found_distance <= distance
+            for found_time, found_distance, _ in destination_labels
+        )
+
+    search_start = start_timer(counters)
+    priority_queue = [(0.0, 0.0, 0)]
+    if counters is not None:
+        counters.heap_pushes += 1
+        counters.max_heap_size = max(counters.max_heap_size, 1)
+    while priority_queue:
+        current_time, current_distance, label = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
+        current_node = label_node[label]
+        route_distance = current_distance + distance_bound[current_node]
+        if current_distance >= best_distance[current_node] or is_capped(
+            route_distance, current_node
+        ):
+            if counters is not None:
+                counters.stale_pops += 1
+            continue
+        best_distance[current_node] = current_distance
+        if fastest_route[current_node] == float("inf"):
+            fastest_route[current_node] = route_distance
+        if counters is not None:
+            counters.settled_nodes += 1
+        if current_node == destination:
+            destination_labels.append((current_time, current_distance, label))
+            continue
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            if counters is not None:
+                counters.relaxations += 1
+            next_node = indices[edge]
+            new_time = current_time + weights[edge]
+            new_distance = current_distance + lengths[edge] / 1000
+            if is_pruned(new_time, new_distance, next_node):
+                continue
+            label_node.append(next_node)
+            label_edge.append(edge)
+            label_parent.append(label)
+            heapq.heappush(
+                priority_queue, (new_time, new_distance, len(label_node) - 1)
+            )
+            if counters is not None:
+                counters.improving_relaxations += 1
+                counters.heap_pushes += 1
+                counters.max_heap_size = max(
+                    counters.max_heap_size, len(priority_queue)
+                )
+    stop_timer(counters, "search_time", search_start)
+
+    reconstruction_start = start_timer(counters)
+    routes: List[Label] = []
+    for time, distance, label in destination_labels:
+        edges_in_path: List[int] = []
+        while label_parent[label] != -1:
+            edges_in_path.append(label_edge[label])
+            label = label_parent[label]
+        edges_in_path.reverse()
+        routes.append((time, distance, edges_in_path))
+    stop_timer(counters, "reconstruction_time", reconstruction_start)
+    return routes
+
+
+def destination_bounds(
+    graph: CompactGraph, destination: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    time_bound = np.array(heuristic_to_destination(graph, destination)) * BOUND_SLACK
+    return time_bound, time_bound * graph.maxspeed.max()
+
+
+def a_star_weighted(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    time_weight: float,
+    distance_weight: float,
+    heuristic: List[float],
+    upper_bound: float = float("inf"),
+    counters: Optional[SearchCounters] = None,
+) -> Optional[List[int]]:
+    # A* on time_weight * hours + distance_weight * km that only returns a route
+    # strictly cheaper than upper_bound, and gives up once its queue reaches it.
+    indptr, indices, weights = graph.adjacency
+    lengths = graph.edge_lengths
+    metre_weight = distance_weight / 1000
+    cost_from_source: List[float] = [float("inf")] * graph.node_count
+    previous_edge: List[int] = [-1] * graph.node_count
+    visited_nodes: List[bool] = [False] * graph.node_count
+
+    search_start = start_timer(counters)
+    cost_from_source[source] = 0.0
+    priority_queue = [(heuristic[source], source)]
+    if counters is not None:
+        counters.heap_pushes += 1
+        counters.max_heap_size = max(counters.max_heap_size, 1)
+    while priority_queue:
+        current_key, current_node = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
+        if current_key >= upper_bound:
+            break
+        if current_node == destination:
+            stop_timer(counters, "search_time", search_start)
+            reconstruction_start = start_timer(counters)
+            edges_in_path: List[int] = []
+            while current_node != source:
+                edges_in_path.append(previous_edge[current_node])
+                current_node = int(graph.edge_sources[edges_in_path[-1]])
+            edges_in_path.reverse()
+            stop_timer(counters, "reconstruction_time", reconstruction_start)
+            return edges_in_path
+        if visited_nodes[current_node]:
+            if counters is not None:
+                counters.stale_pops += 1
+            continue
+        visited_nodes[current_node] = True
+        if counters is not None:
+            counters.settled_nodes += 1
+        current_cost = cost_from_source[current_node]
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            if counters is not None:
+                counters.relaxations += 1
+            next_node = indices[edge]
+            new_cost = (
+                current_cost
+                + time_weight * weights[edge]
+                + metre_weight * lengths[edge]
+            )
+            new_key = new_cost + heuristic[next_node]
+            if cost_from_source[next_node] > new_cost and new_key < upper_bound:
+                cost_from_source[next_node] = new_cost
+                previous_edge[next_node] = edge
+                heapq.heappush(priority_queue, (new_key, next_node))
+                if counters is not None:
+                    counters.improving_relaxations += 1
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size, len(priority_queue)
+                    )
+    stop_timer(counters, "search_time", search_start)
+    return None
+
+
+def weighted_routes(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    weightings: Dict[str, Tuple[float, float]] = DEFAULT_WEIGHTINGS,
+    counters: Optional[SearchCounters] = None,
+) -> Dict[str, Label]:
+    # One A* per weighting. They share the straight-line bounds, and every route
+    # found so far is an upper bound for the later weightings, so a weighting an
+    # earlier route already serves stops as soon as its queue reaches that cost.
+    if source == destination:
+        return {name: (0.0, 0.0, []) for name in weightings}
+    heuristic_start = start_timer(counters)
+    time_bound, distance_bound = destination_bounds(graph, destination)
+    stop_timer(counters, "heuristic_time", heuristic_start)
+
+    routes: List[Label] = []
+    named_routes: Dict[str, Label] = dict()
+    for name, (time_weight, distance_weight) in weightings.items():
+
+        def route_cost(route: Label) -> float:
+            return time_weight * route[0] + distance_weight * route[1]
+
+        best_route = min(routes, key=route_cost, default=None)
+        heuristic_start = start_timer(counters)
+        heuristic = (
+            time_weight * time_bound + distance_weight * distance_bound
+        ).tolist()
+        stop_timer(counters, "heuristic_time", heuristic_start)
+        edges_in_path = a_star_weighted(
+            graph,
+            source,
+            destination,
+            time_weight,
+            distance_weight,
+            heuristic,
+            route_cost(best_route) if best_route else float("inf"),
+            counters,
+        )
+        if edges_in_path is not None:
+            best_route = (
+                float(graph.weight[edges_in_path].sum()),
+                float(graph.length[edges_in_path].sum()) / 1000,
+                edges_in_path,
+            )
+            routes.append(best_route)
+        if best_route is None:
+            return dict()
+        named_routes[name] = best_route
+    return named_routes
+
+
+if __name__ == "__main__":
+    from .batch import load_compact_graph_for_batch
+
+    parser = argparse.ArgumentParser(
+        prog="ParetoRouting",
+        description="Find fastest, shortest and economical routes together",
+    )
+    parser.add_argument("source", type=int, help="OSM id of the source node")
+    parser.add_argument("destination", type=int, help="OSM id of the target")
+    parser.add_argument("-l", "--location", type=str)
+    parser.add_argument("--graphml", type=str)
+    parser.add_argument("--graph", type=str, help="saved compact graph (.npz)")
+    parser.add_argument(
+        "--max-labels", type=int, default=MAX_LABELS, help="label cap for --pareto"
+    )
+    parser.add_argument(
+        "--pareto", action="store_true", help="print the whole Pareto set"
+    )
+    args = parser.parse_args()
+    if args.location is None and args.graphml is None and args.graph is None:
+        parser.error("one of --location, --graphml or --graph is required")
+
+    graph = load_compact_graph_for_batch(args.location, args.graphml, args.graph)
+    source = graph.id_map.dense(args.source)
+    destination = graph.id_map.dense(args.destination)
+    counters = SearchCounters()
+    if args.pareto:
+        named_routes = {
+            f"pareto {number}": route
+            for number, route in enumerate(
+                pareto_search(graph, source, destination, args.max_labels, counters)
+            )
+        }
+    else:
+        named_routes = weighted_routes(graph, source, destination, counters=counters)
+    if not named_routes:
+        print("Failed to find a path")
+    for name, (time, distance, edges_in_path) in named_routes.items():
+        time_sec = time * 60 * 60
+        print(
+            f"{name}: {distance:.3f} km, "
+            f"{int(time_sec // 60)} m {int(time_sec % 60)} sec, "
+            f"{len(edges_in_path)} edges"
+        )
+    print(f"Settled {counters.settled_nodes} {'labels' if args.pareto else 'nodes'}")
@@ -1,8 +1,7 @@
-import osmnx as ox
-from networkx import MultiDiGraph
-from typing import Dict, List, Optional, Set
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
 import random
-import requests
 import heapq
 
 from .modules.utils import (
@@ -11,27 +10,54 @@ from .modules.utils import (
     load_multidigraph,
 )
 from .modules.simple_graph import RawNode, NodeId, Edge, EdgeId, Graph
+from .modules.counters import (
+    SearchCounters,
+    emit_metrics,
+    start_timer,
+    stop_timer,
+)
 
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
 
-def dijkstra_raw(graph: Graph, source: int, destination: int) -> Optional[int]:
+
+def dijkstra_raw(
+    graph: Graph,
+    source: int,
+    destination: int,
+    counters: Optional[SearchCounters] = None,
+) -> Optional[int]:
     weight_from_source: Dict[NodeId, float] = dict()
     visited_nodes: Set[NodeId] = set()
     previous_node: Dict[NodeId, Optional[NodeId]] = dict()
 
+    search_start = start_timer(counters)
     iteration = 0
     priority_queue = [(0, source)]
+    if counters is not None:
+        counters.heap_pushes += 1
+        counters.max_heap_size = max(counters.max_heap_size, 1)
     previous_node[source] = None
     while priority_queue:
         current_weight, current_node_id = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
         if current_node_id == destination:
+            stop_timer(counters, "search_time", search_start)
             return iteration, weight_from_source, previous_node
         current_node: RawNode = graph.nodes[current_node_id]
         if current_node_id in visited_nodes:
+            if counters is not None:
+                counters.stale_pops += 1
             continue
         visited_nodes.add(current_node_id)
+        if counters is not None:
+            counters.settled_nodes += 1
         next_nodes_id: List[NodeId] = current_node.next_nodes
         for next_node_id in next_nodes_id:
             iteration += 1
+            if counters is not None:
+                counters.relaxations += 1
 
             current_edge_id: EdgeId = (current_node_id, next_node_id)
             current_edge: Edge = graph.edges[current_edge_id]
@@ -42,6 +68,13 @@ def dijkstra_raw(graph: Graph, source: int, destination: int) -> Optional[int]:
                 weight_from_source[next_node_id] = new_weight
                 previous_node[next_node_id] = current_node_id
                 heapq.heappush(priority_queue, (new_weight, next_node_id))
+                if counters is not None:
+                    counters.improving_relaxations += 1
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size, len(priority_queue)
+                    )
+    stop_timer(counters, "search_time", search_start)
     return None
 
 
@@ -51,7 +84,9 @@ def reconstruct_path_raw(
     source: NodeId,
     destination: NodeId,
     path: Dict[NodeId, Optional[NodeId]],
+    counters: Optional[SearchCounters] = None,
 ):
+    reconstruction_start = start_timer(counters)
     dist: float = 0
     time: float = 0
     edges_in_path: List[EdgeId] = []
@@ -67,14 +102,25 @@ def reconstruct_path_raw(
         time += (current_length / 1000) / current_maxspeed
         current_node_id = previous_node_id
     time_in_sec = int(time * 60 * 60)
+    stop_timer(counters, "reconstruction_time", reconstruction_start)
     print(f"Total dist = {dist} km")
     print(f"Total time = {time_in_sec // 60} min {time_in_sec%60} sec")
     print(f"Speed average = {dist / time}")
     plot_graph_raw(G, edges_in_path)
 
 
-def run_raw_dijkstra(location=None, source_point=None, destination_point=None) -> None:
+def run_raw_dijkstra(
+    location=None,
+    source_point=None,
+    destination_point=None,
+    metrics=None,
+    metrics_format="json",
+) -> None:
+    import osmnx as ox
+
     if location is None or source_point is None:
+        import requests
+
         response = requests.get("https://ipinfo.io")
         response_json = response.json()
         location = f"{response_json['city']}, {response_json['country']}"
@@ -99,10 +145,18 @@ def run_raw_dijkstra(location=None, source_point=None, destination_point=None) -
 
     graph = convert_multidigraph_to_graph(G)
 
-    result = dijkstra_raw(graph, source, destination)
+    counters = SearchCounters() if metrics is not None else None
+    result = dijkstra_raw(graph, source, destination, counters=counters)
     if result is not None:
         iterations, distances, path = result
         print(f"Iterations: {iterations}")
-        reconstruct_path_raw(G, graph, source, destination, path)
+        reconstruct_path_raw(G, graph, source, destination, path, counters=counters)
     else:
         print("Failed to find a path")
+    if counters is not None:
+        emit_metrics(
+            counters,
+            metrics,
+            metrics_format,
+            labels={"algorithm": "dijkstra_raw", "location": location},
+        )
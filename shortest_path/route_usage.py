@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from multiprocessing import Pool
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
+from .compact_search import shortest_path_tree
+from .modules.compact_graph import CompactGraph, convert_multidigraph_to_compact_graph
+from .modules.edge_attributes import EdgeAttributes, edge_attributes
+from .modules.raster import plot_heatmap_raster
+from .modules.utils import clean_max_speed, load_multidigraph, plot_heatmap
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
+
+SourceBatch = List[Tuple[int, np.ndarray]]
+
+_worker_graph: Optional[CompactGraph] = None
+
+
+def generate_od_batches(
+    graph: CompactGraph, routes: int, sources: int, seed: int
+) -> SourceBatch:
+    # Grouping destinations by source lets one shortest path tree serve many routes.
+    rng = np.random.default_rng(seed)
+    sources = max(1, min(sources, routes))
+    source_nodes = rng.integers(graph.node_count, size=sources)
+    destinations = rng.integers(graph.node_count, size=routes)
+    return [
+        (int(source), chunk)
+        for source, chunk in zip(source_nodes, np.array_split(destinations, sources))
+    ]
+
+
+def accumulate_source_usage(
+    graph: CompactGraph, source: int, destinations: np.ndarray, uses: np.ndarray
+) -> int:
+    _, previous_edge, settled_order = shortest_path_tree(graph, source)
+    previous = np.array(previous_edge)
+    has_parent = previous >= 0
+    parent = np.full(graph.node_count, -1, dtype=np.int64)
+    parent[has_parent] = graph.edge_sources[previous[has_parent]]
+    parent_list = parent.tolist()
+
+    # Every route to a node also crosses the node's tree edge, so the demand is
+    # pushed towards the source once in reverse settle order instead of walking
+    # each route separately.
+    demand = np.bincount(destinations, minlength=graph.node_count).tolist()
+    for node in reversed(settled_order):
+        node_demand = demand[node]
+        if node_demand and node != source:
+            demand[parent_list[node]] += node_demand
+
+    flow = np.array(demand, dtype=np.int64)
+    used = has_parent & (flow > 0)
+    uses[previous[used]] += flow[used]
+
+    reached = np.zeros(graph.node_count, dtype=bool)
+    reached[settled_order] = True
+    return int(reached[destinations].sum())
+
+
+def _init_worker(graph: CompactGraph) -> None:
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _route_batch(batch: SourceBatch) -> Tuple[np.ndarray, int]:
+    graph = _worker_graph
+    uses = np.zeros(graph.edge_count, dtype=np.int64)
+    routed = 0
+    for source, destinations in batch:
+        routed += accumulate_source_usage(graph, source, destinations, uses)
+    return uses, routed
+
+
+def aggregate_route_usage(
+    graph: CompactGraph,
+    routes: int,
+    sources: int = 1000,
+    seed: int = 0,
+    workers: Optional[int] = None,
+) -> Tuple[np.ndarray, int]:
+    od_batches = generate_od_batches(graph, routes, sources, seed)
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, len(od_batches) // (workers * 4))
+    tasks: List[SourceBatch] = [
+        od_batches[index : index + chunk_size]
+        for index in range(0, len(od_batches), chunk_size)
+    ]
+    uses = np.zeros(graph.edge_count, dtype=np.int64)
+    routed = 0
+    if workers == 1:
+        _init_worker(graph)
+        for partial_uses, partial_routed in map(_route_batch, tasks):
+            uses += partial_uses
+            routed += partial_routed
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=(graph,)) as pool:
+            for partial_uses, partial_routed in pool.imap_unordered(
+                _route_batch, tasks
+            ):
+                uses += partial_uses
+                routed += partial_routed
+    return uses, routed
+
+
+def save_route_usage(attributes: EdgeAttributes, uses: np.ndarray, path: str) -> None:
+    np.savez_compressed(path, uses=uses, edge_keys=attributes.keys)
+
+
+def set_route_usage(
+    G: MultiDiGraph, attributes: EdgeAttributes, uses: np.ndarray, algorithm: str
+) -> None:
+    for edge_key, edge_uses in zip(attributes.keys.tolist(), uses.tolist()):
+        G.edges[tuple(edge_key)][f"{algorithm}_uses"] = edge_uses
+
+
+def run_route_usage(
+    location=None,
+    graphml=None,
+    routes=1_000_000,
+    sources=1000,
+    seed=0,
+    workers=None,
+    output="./assets/route_usage",
+    raster=False,
+) -> None:
+    if graphml is not None:
+        import osmnx as ox
+
+        G: MultiDiGraph = ox.load_graphml(graphml)
+    else:
+        G = load_multidigraph(location)
+    clean_max_speed(G)
+    graph = convert_multidigraph_to_compact_graph(G)
+
+    start = time.perf_counter()
+    uses, routed = aggregate_route_usage(graph, routes, sources, seed, workers)
+    elapsed = time.perf_counter() - start
+    print(f"Routed {routed}/{routes} routes in {elapsed:.1f} s")
+    print(f"Routes per second = {routed / elapsed:.0f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    attributes = edge_attributes(G, graph)
+    save_route_usage(attributes, uses, f"{output}_uses.npz")
+    if raster:
+        plot_heatmap_raster(
+            graph.x,
+            graph.y,
+            graph.edge_sources,
+            graph.indices,
+            uses,
+            filepath=f"{output}.png",
+        )
+        return
+    algorithm = "dijkstra_compact"
+    set_route_usage(G, attributes, np.log1p(uses), algorithm)
+    plot_heatmap(G, algorithm, filepath=f"{output}.png")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="RouteUsage",
+        description="Aggregate edge usage over many seeded routes into a heatmap",
+    )
+    parser.add_argument("-l", "--location", type=str)
+    parser.add_argument("--graphml", type=str)
+    parser.add_argument("--routes", type=int, default=1_000_000)
+    parser.add_argument("--sources", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", type=str, default="./assets/route_usage")
+    parser.add_argument("--raster", action="store_true")
+    args = parser.parse_args()
+    if args.location is None and args.graphml is None:
+        parser.error("one of --location or --graphml is required")
+
+    run_route_usage(
+        location=args.location,
+        graphml=args.graphml,
+        routes=args.routes,
+        sources=args.sources,
+        seed=args.seed,
+        workers=args.workers,
+        output=args.output,
+        raster=args.raster,
+    )
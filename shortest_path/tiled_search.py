@@ -0,0 +1,168 @@
+import argparse
+import heapq
+import time
+from math import asin, cos, radians, sin, sqrt
+from typing import Dict, List, Optional, Tuple
+
+from .modules.counters import SearchCounters, start_timer, stop_timer
+from .modules.tiled_graph import TiledGraph
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(x1: float, y1: float, x2: float, y2: float) -> float:
+    a = (
+        sin(radians(y2 - y1) / 2) ** 2
+        + cos(radians(y1)) * cos(radians(y2)) * sin(radians(x2 - x1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+
+
+def a_star_tiled(
+    graph: TiledGraph,
+    source: int,
+    destination: int,
+    counters: Optional[SearchCounters] = None,
+    prefetch: bool = True,
+    use_heuristic: bool = True,
+) -> Optional[Tuple[int, Dict[int, float], Dict[int, Optional[int]]]]:
+    # Search state lives in dicts sized by the explored area, never by the graph,
+    # and adjacency is read from tiles faulted in as the frontier reaches them.
+    if prefetch:
+        graph.prefetch_corridor(source, destination)
+    destination_x, destination_y = graph.coordinates(destination)
+    max_speed = graph.max_speed
+
+    def heuristic(node: int) -> float:
+        if not use_heuristic:
+            return 0.0
+        heuristic_start = start_timer(counters)
+        x, y = graph.coordinates(node)
+        weight = haversine_km(x, y, destination_x, destination_y) / max_speed
+        stop_timer(counters, "heuristic_time", heuristic_start)
+        return weight
+
+    weight_from_source: Dict[int, float] = {source: 0.0}
+    previous_node: Dict[int, Optional[int]] = {source: None}
+    visited_nodes = set()
+
+    search_start = start_timer(counters)
+    iteration = 0
+    priority_queue = [(heuristic(source), source)]
+    if counters is not None:
+        counters.heap_pushes += 1
+        counters.max_heap_size = max(counters.max_heap_size, 1)
+    while priority_queue:
+        _, current_node = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
+        if current_node == destination:
+            stop_timer(counters, "search_time", search_start)
+            return iteration, weight_from_source, previous_node
+        if current_node in visited_nodes:
+            if counters is not None:
+                counters.stale_pops += 1
+            continue
+        visited_nodes.add(current_node)
+        if counters is not None:
+            counters.settled_nodes += 1
+        tile = graph.node_tile(current_node)
+        local = current_node - tile.node_start
+        current_weight = weight_from_source[current_node]
+        for edge in range(tile.indptr[local], tile.indptr[local + 1]):
+            iteration += 1
+            if counters is not None:
+                counters.relaxations += 1
+            next_node = tile.indices[edge]
+            new_weight = current_weight + tile.weights[edge]
+            if weight_from_source.get(next_node, float("inf")) > new_weight:
+                weight_from_source[next_node] = new_weight
+                previous_node[next_node] = current_node
+                heapq.heappush(
+                    priority_queue, (new_weight + heuristic(next_node), next_node)
+                )
+                if counters is not None:
+                    counters.improving_relaxations += 1
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size, len(priority_queue)
+                    )
+    stop_timer(counters, "search_time", search_start)
+    return None
+
+
+def dijkstra_tiled(
+    graph: TiledGraph,
+    source: int,
+    destination: int,
+    counters: Optional[SearchCounters] = None,
+    prefetch: bool = True,
+) -> Optional[Tuple[int, Dict[int, float], Dict[int, Optional[int]]]]:
+    return a_star_tiled(
+        graph, source, destination, counters, prefetch=prefetch, use_heuristic=False
+    )
+
+
+def reconstruct_path_tiled(
+    graph: TiledGraph,
+    source: int,
+    destination: int,
+    previous_node: Dict[int, Optional[int]],
+) -> List[int]:
+    path: List[int] = [destination]
+    while path[-1] != source:
+        path.append(previous_node[path[-1]])
+    path.reverse()
+    return graph.id_map.to_osm(path).tolist()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="TiledRouting",
+        description="Build a tiled graph file or route on it with a fixed tile budget",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("output", type=str)
+    build_parser.add_argument("-l", "--location", type=str)
+    build_parser.add_argument("--graphml", type=str)
+    build_parser.add_argument("--tile-size", type=float, default=0.05)
+    route_parser = subparsers.add_parser("route")
+    route_parser.add_argument("tiles", type=str)
+    route_parser.add_argument("source", type=int, help="OSM id of the source node")
+    route_parser.add_argument("destination", type=int, help="OSM id of the target")
+    route_parser.add_argument("--max-resident-tiles", type=int, default=64)
+    route_parser.add_argument("--no-prefetch", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from .batch import load_compact_graph_for_batch
+        from .modules.tiled_graph import write_tiled_graph
+
+        graph = load_compact_graph_for_batch(args.location, args.graphml)
+        write_tiled_graph(graph, args.output, args.tile_size)
+        print(f"Tiled graph written to {args.output}")
+    else:
+        tiled_graph = TiledGraph(args.tiles, args.max_resident_tiles)
+        source = tiled_graph.id_map.dense(args.source)
+        destination = tiled_graph.id_map.dense(args.destination)
+        counters = SearchCounters()
+        start = time.perf_counter()
+        result = a_star_tiled(
+            tiled_graph, source, destination, counters, prefetch=not args.no_prefetch
+        )
+        elapsed = time.perf_counter() - start
+        if result is None:
+            print("Failed to find a path")
+        else:
+            _, weight_from_source, previous_node = result
+            time_sec = weight_from_source[destination] * 60 * 60
+            path = reconstruct_path_tiled(
+                tiled_graph, source, destination, previous_node
+            )
+            print(f"Total time = {int(time_sec // 60)} m {int(time_sec % 60)} sec")
+            print(f"Nodes in path = {len(path)}")
+        print(
+            f"Search took {elapsed:.3f} s with {tiled_graph.tile_faults} tile faults "
+            f"and {tiled_graph.tile_evictions} evictions"
+        )
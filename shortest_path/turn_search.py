@@ -0,0 +1,197 @@
+import argparse
+import heapq
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .compact_search import heuristic_to_destination
+from .modules.compact_graph import CompactGraph
+from .modules.counters import SearchCounters, start_timer, stop_timer
+from .modules.turn_costs import TurnCostModel
+
+
+def a_star_turns(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    turn_costs: TurnCostModel,
+    counters: Optional[SearchCounters] = None,
+    use_heuristic: bool = True,
+) -> Optional[Tuple[int, List[float], List[int], int]]:
+    # Search states are the directed edges of the CSR graph: the weight of an edge
+    # is the cost of reaching its head, and relaxing it walks the out-edges of that
+    # head with the turn cost added, so no line graph is ever materialised.
+    # Reaching the source itself needs no edge, and last_edge -1 marks that route.
+    if source == destination:
+        return 0, [], [], -1
+    indptr, indices, weights = graph.adjacency
+    weight_from_source: List[float] = [float("inf")] * graph.edge_count
+    previous_edge: List[int] = [-1] * graph.edge_count
+    visited_edges: List[bool] = [False] * graph.edge_count
+
+    heuristic_start = start_timer(counters)
+    if use_heuristic:
+        heuristic = heuristic_to_destination(graph, destination)
+    else:
+        heuristic = [0.0] * graph.node_count
+    stop_timer(counters, "heuristic_time", heuristic_start)
+
+    search_start = start_timer(counters)
+    iteration = 0
+    priority_queue: List[Tuple[float, int]] = []
+    for edge in range(indptr[source], indptr[source + 1]):
+        if weights[edge] < weight_from_source[edge]:
+            weight_from_source[edge] = weights[edge]
+            heapq.heappush(
+                priority_queue, (weights[edge] + heuristic[indices[edge]], edge)
+            )
+    if counters is not None:
+        counters.heap_pushes += len(priority_queue)
+        counters.max_heap_size = max(counters.max_heap_size, len(priority_queue))
+    while priority_queue:
+        _, current_edge = heapq.heappop(priority_queue)
+        if counters is not None:
+            counters.heap_pops += 1
+        current_node = indices[current_edge]
+        if current_node == destination:
+            stop_timer(counters, "search_time", search_start)
+            return iteration, weight_from_source, previous_edge, current_edge
+        if visited_edges[current_edge]:
+            if counters is not None:
+                counters.stale_pops += 1
+            continue
+        visited_edges[current_edge] = True
+        if counters is not None:
+            counters.settled_nodes += 1
+        current_weight = weight_from_source[current_edge]
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            iteration += 1
+            if counters is not None:
+                counters.relaxations += 1
+            turn_cost = turn_costs.turn_cost(current_edge, edge)
+            if turn_cost is None:
+                continue
+            new_weight = current_weight + turn_cost + weights[edge]
+            if weight_from_source[edge] > new_weight:
+                weight_from_source[edge] = new_weight
+                previous_edge[edge] = current_edge
+                heapq.heappush(
+                    priority_queue, (new_weight + heuristic[indices[edge]], edge)
+                )
+                if counters is not None:
+                    counters.improving_relaxations += 1
+                    counters.heap_pushes += 1
+                    counters.max_heap_size = max(
+                        counters.max_heap_size, len(priority_queue)
+                    )
+    stop_timer(counters, "search_time", search_start)
+    return None
+
+
+def dijkstra_turns(
+    graph: CompactGraph,
+    source: int,
+    destination: int,
+    turn_costs: TurnCostModel,
+    counters: Optional[SearchCounters] = None,
+) -> Optional[Tuple[int, List[float], List[int], int]]:
+    return a_star_turns(
+        graph, source, destination, turn_costs, counters, use_heuristic=False
+    )
+
+
+map_to_turn_strategies: Dict[str, Callable] = {
+    "dijkstra": dijkstra_turns,
+    "a_star": a_star_turns,
+}
+
+
+def reconstruct_path_turns(
+    graph: CompactGraph,
+    last_edge: int,
+    weight_from_source: List[float],
+    previous_edge: List[int],
+    counters: Optional[SearchCounters] = None,
+) -> Tuple[List[int], float, float]:
+    if last_edge == -1:
+        return [], 0.0, 0.0
+    reconstruction_start = start_timer(counters)
+    edges_in_path: List[int] = [last_edge]
+    while previous_edge[edges_in_path[-1]] != -1:
+        edges_in_path.append(previous_edge[edges_in_path[-1]])
+    edges_in_path.reverse()
+    dist = float(graph.length[edges_in_path].sum()) / 1000
+    # Unlike the node-based path the time includes the turn costs paid on the way.
+    time_sec = weight_from_source[last_edge] * 60 * 60
+    stop_timer(counters, "reconstruction_time", reconstruction_start)
+    return edges_in_path, dist, time_sec
+
+
+if __name__ == "__main__":
+    from .modules.compact_graph import convert_multidigraph_to_compact_graph
+    from .modules.edge_attributes import edge_attributes
+    from .modules.turn_costs import (
+        fetch_turn_restrictions,
+        turn_restrictions_from_relations,
+    )
+    from .modules.utils import clean_max_speed, load_multidigraph
+
+    parser = argparse.ArgumentParser(
+        prog="TurnRouting",
+        description="Route with turn costs and OSM turn restrictions",
+    )
+    parser.add_argument("source", type=int, help="OSM id of the source node")
+    parser.add_argument("destination", type=int, help="OSM id of the target")
+    parser.add_argument("-l", "--location", type=str)
+    parser.add_argument("--graphml", type=str)
+    parser.add_argument(
+        "-s", "--strategy", choices=list(map_to_turn_strategies), default="a_star"
+    )
+    parser.add_argument("--u-turn-seconds", type=float, default=30.0)
+    parser.add_argument("--crossing-turn-seconds", type=float, default=8.0)
+    parser.add_argument("--non-crossing-turn-seconds", type=float, default=3.0)
+    parser.add_argument("--drive-on-left", action="store_true")
+    parser.add_argument("--no-restrictions", action="store_true")
+    args = parser.parse_args()
+
+    if args.graphml is not None:
+        import osmnx as ox
+
+        G = ox.load_graphml(args.graphml)
+    elif args.location is not None:
+        G = load_multidigraph(args.location)
+    else:
+        parser.error("one of --location or --graphml is required")
+    clean_max_speed(G)
+    graph = convert_multidigraph_to_compact_graph(G)
+    attributes = edge_attributes(G, graph)
+    turn_costs = TurnCostModel(
+        graph,
+        attributes,
+        u_turn_seconds=args.u_turn_seconds,
+        crossing_turn_seconds=args.crossing_turn_seconds,
+        non_crossing_turn_seconds=args.non_crossing_turn_seconds,
+        drive_on_right=not args.drive_on_left,
+    )
+    if not args.no_restrictions:
+        relations = fetch_turn_restrictions(graph)
+        turn_costs.banned_turns, turn_costs.only_turns = (
+            turn_restrictions_from_relations(G, graph, relations, attributes)
+        )
+        print(f"Loaded {len(relations)} turn restrictions")
+
+    source = graph.id_map.dense(args.source)
+    destination = graph.id_map.dense(args.destination)
+    counters = SearchCounters()
+    result = map_to_turn_strategies[args.strategy](
+        graph, source, destination, turn_costs, counters
+    )
+    if result is None:
+        print("Failed to find a path")
+    else:
+        _, weight_from_source, previous_edge, last_edge = result
+        edges_in_path, dist, time_sec = reconstruct_path_turns(
+            graph, last_edge, weight_from_source, previous_edge, counters
+        )
+        print(f"Total distance = {dist:.3f} km")
+        print(f"Total time = {int(time_sec // 60)} m {int(time_sec % 60)} sec")
+        print(f"Edges in path = {len(edges_in_path)}")
+    print(f"Settled {counters.settled_nodes} edge states")
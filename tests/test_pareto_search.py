@@ -0,0 +1,50 @@
+import numpy as np
+
+from shortest_path.modules.compact_graph import CompactGraph
+from shortest_path.modules.node_ids import to_fixed
+from shortest_path.pareto_search import pareto_search
+
+
+def random_grid(size: int = 15, seed: int = 0) -> CompactGraph:
+    # A two-way grid with detours in length and mixed speeds, so time and distance
+    # disagree and the uncapped Pareto set is much larger than the cap.
+    rng = np.random.default_rng(seed)
+    xs, ys = np.meshgrid(np.arange(size), np.arange(size))
+    node = np.arange(size * size).reshape(size, size)
+    pairs = [(node[:, :-1], node[:, 1:]), (node[:-1, :], node[1:, :])]
+    sources = np.concatenate(
+        [a.ravel() for a, b in pairs] + [b.ravel() for a, b in pairs]
+    )
+    targets = np.concatenate(
+        [b.ravel() for a, b in pairs] + [a.ravel() for a, b in pairs]
+    )
+    order = np.argsort(sources, kind="stable")
+    edge_count = len(sources)
+    indptr = np.zeros(size * size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=size * size), out=indptr[1:])
+    return CompactGraph(
+        node_ids=np.arange(size * size, dtype=np.int64) + 1000,
+        x_fixed=to_fixed(xs.ravel() * 0.001),
+        y_fixed=to_fixed(ys.ravel() * 0.001),
+        indptr=indptr,
+        indices=targets[order].astype(np.uint32),
+        length=rng.uniform(111.0, 250.0, edge_count),
+        maxspeed=rng.choice([20.0, 30.0, 50.0, 80.0], edge_count),
+    )
+
+
+def test_capped_pareto_set_keeps_the_fastest_and_shortest_routes():
+    graph = random_grid()
+    rng = np.random.default_rng(1)
+    for source, destination in rng.integers(graph.node_count, size=(20, 2)):
+        uncapped = pareto_search(graph, int(source), int(destination), None)
+        capped = pareto_search(graph, int(source), int(destination), 4)
+        assert len(capped) <= 4
+        for index in (0, 1):
+            assert np.isclose(
+                min(route[index] for route in capped),
+                min(route[index] for route in uncapped),
+            )
+        for time, distance, edges_in_path in capped:
+            assert np.isclose(time, graph.weight[edges_in_path].sum())
+            assert np.isclose(distance, graph.length[edges_in_path].sum() / 1000)
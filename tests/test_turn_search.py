@@ -0,0 +1,114 @@
+import numpy as np
+
+from shortest_path.modules.compact_graph import CompactGraph
+from shortest_path.modules.node_ids import to_fixed
+from shortest_path.modules.turn_costs import TurnCostModel
+from shortest_path.turn_search import (
+    a_star_turns,
+    dijkstra_turns,
+    reconstruct_path_turns,
+)
+
+
+def two_way_line() -> CompactGraph:
+    # 0 <-> 1 <-> 2 along a parallel, so leaving a node and coming back is a U-turn.
+    return CompactGraph(
+        node_ids=np.array([10, 11, 12], dtype=np.int64),
+        x_fixed=to_fixed([0.0, 0.01, 0.02]),
+        y_fixed=to_fixed([0.0, 0.0, 0.0]),
+        indptr=np.array([0, 1, 3, 4], dtype=np.int64),
+        indices=np.array([1, 0, 2, 1], dtype=np.uint32),
+        length=np.array([1100.0, 1100.0, 1100.0, 1100.0]),
+        maxspeed=np.full(4, 50.0),
+    )
+
+
+def test_source_equals_destination_is_an_empty_route():
+    graph = two_way_line()
+    turn_costs = TurnCostModel(graph)
+    for search in (a_star_turns, dijkstra_turns):
+        iteration, weight_from_source, previous_edge, last_edge = search(
+            graph, 1, 1, turn_costs
+        )
+        assert iteration == 0
+        assert last_edge == -1
+        assert reconstruct_path_turns(
+            graph, last_edge, weight_from_source, previous_edge
+        ) == ([], 0.0, 0.0)
+
+
+def test_route_between_distinct_nodes():
+    graph = two_way_line()
+    result = a_star_turns(graph, 0, 2, TurnCostModel(graph))
+    assert result is not None
+    _, weight_from_source, previous_edge, last_edge = result
+    edges_in_path, dist, _ = reconstruct_path_turns(
+        graph, last_edge, weight_from_source, previous_edge
+    )
+    assert edges_in_path == [0, 2]
+    assert dist == 2.2
+
+
+def test_only_turn_to_a_missing_way_is_ignored():
+    import networkx as nx
+
+    from shortest_path.modules.compact_graph import (
+        convert_multidigraph_to_compact_graph,
+    )
+    from shortest_path.modules.turn_costs import turn_restrictions_from_relations
+
+    # 1 -> 2 -> 3 -> 4 on ways 100, 200 and 300, with a restriction from way 100
+    # through node 2 onto way 400, which was clipped out of the graph.
+    G = nx.MultiDiGraph()
+    for node, x in zip([1, 2, 3, 4], [0.0, 0.01, 0.02, 0.03]):
+        G.add_node(node, x=x, y=0.0)
+    for u, v, way in [(1, 2, 100), (2, 3, 200), (3, 4, 300)]:
+        G.add_edge(u, v, length=1100.0, maxspeed=50, osmid=way)
+    graph = convert_multidigraph_to_compact_graph(G)
+    turn_costs = TurnCostModel(graph)
+    turn_costs.banned_turns, turn_costs.only_turns = turn_restrictions_from_relations(
+        G,
+        graph,
+        [{"restriction": "only_straight_on", "from": 100, "via": 2, "to": 400}],
+    )
+    assert turn_costs.only_turns == {}
+    source, destination = graph.id_map.dense(1), graph.id_map.dense(3)
+    assert a_star_turns(graph, source, destination, turn_costs) is not None
+
+
+def test_turn_angles_follow_the_edge_geometry():
+    import networkx as nx
+    from shapely.geometry import LineString
+
+    from shortest_path.modules.compact_graph import (
+        convert_multidigraph_to_compact_graph,
+    )
+    from shortest_path.modules.edge_attributes import edge_attributes
+
+    # 1 -> 2 dips south and arrives at 2 heading north, so carrying on north to 3
+    # is straight on although the chords of the two edges meet at a right angle.
+    G = nx.MultiDiGraph()
+    for node, x, y in [(1, 0.0, 0.0), (2, 0.01, 0.0), (3, 0.01, 0.01), (4, 0.02, 0.0)]:
+        G.add_node(node, x=x, y=y)
+    G.add_edge(
+        1,
+        2,
+        length=2200.0,
+        maxspeed=50,
+        geometry=LineString([(0.0, 0.0), (0.01, -0.01), (0.01, 0.0)]),
+    )
+    G.add_edge(2, 3, length=1100.0, maxspeed=50)
+    G.add_edge(2, 4, length=1100.0, maxspeed=50)
+    graph = convert_multidigraph_to_compact_graph(G)
+    attributes = edge_attributes(G, graph)
+    into_2, to_3, to_4 = (
+        int(graph.indptr[graph.id_map.dense(1)]),
+        int(graph.indptr[graph.id_map.dense(2)]),
+        int(graph.indptr[graph.id_map.dense(2)]) + 1,
+    )
+
+    assert TurnCostModel(graph).turn_cost(into_2, to_3) > 0
+    assert TurnCostModel(graph, attributes).turn_cost(into_2, to_3) == 0
+    # Turning right across the opposing traffic when driving on the left.
+    turn_costs = TurnCostModel(graph, attributes, drive_on_right=False)
+    assert turn_costs.turn_cost(into_2, to_4) == turn_costs.crossing_turn_seconds / 3600